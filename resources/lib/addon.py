@@ -5,12 +5,9 @@ from __future__ import absolute_import, division, unicode_literals
 
 import logging
 
-from requests import HTTPError
 from routing import Plugin
 
 from resources.lib import kodilogging, kodiutils
-from resources.lib.solocoo.auth import AuthApi
-from resources.lib.solocoo.exceptions import InvalidLoginException
 
 routing = Plugin()  # pylint: disable=invalid-name
 
@@ -29,12 +26,14 @@ def index():
 
         kodiutils.open_settings()
 
+    from requests import HTTPError
+
+    from resources.lib.modules.context import get_context
+    from resources.lib.solocoo.exceptions import InvalidLoginException
+
     try:
         # Try authentication
-        AuthApi(username=kodiutils.get_setting('username'),
-                password=kodiutils.get_setting('password'),
-                tenant=kodiutils.get_setting('tenant'),
-                token_path=kodiutils.get_tokens_path())
+        get_context()
     except InvalidLoginException:
         kodiutils.ok_dialog(message=kodiutils.localize(30203))  # Your credentials are not valid!
         kodiutils.open_settings()
@@ -160,7 +159,15 @@ def iptv_channels():
 def iptv_epg():
     """ Generate EPG data for the Kodi PVR integration """
     from resources.lib.modules.iptvmanager import IPTVManager
-    IPTVManager(int(routing.args['port'][0])).send_epg()  # pylint: disable=too-many-function-args
+    days_past = int(routing.args['days_past'][0]) if routing.args.get('days_past') else None
+    days_future = int(routing.args['days_future'][0]) if routing.args.get('days_future') else None
+
+    if routing.args.get('format', [None])[0] == 'xmltv':
+        IPTVManager().write_xmltv(days_past=days_past, days_future=days_future)
+        kodiutils.notification(message=kodiutils.localize(30714))  # The XMLTV file has been exported.
+        return
+
+    IPTVManager(int(routing.args['port'][0])).send_epg(days_past, days_future)  # pylint: disable=too-many-function-args
 
 
 def run(params):
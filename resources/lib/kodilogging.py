@@ -26,9 +26,7 @@ class KodiLogHandler(logging.StreamHandler):
         else:
             self.info_level = xbmc.LOGNOTICE
 
-    def emit(self, record):
-        """ Emit a log message """
-        levels = {
+        self.levels = {
             logging.CRITICAL: xbmc.LOGFATAL,
             logging.ERROR: xbmc.LOGERROR,
             logging.WARNING: xbmc.LOGWARNING,
@@ -37,22 +35,39 @@ class KodiLogHandler(logging.StreamHandler):
             logging.NOTSET: xbmc.LOGNONE,
         }
 
-        # Map DEBUG level to info_level if debug logging setting has been activated
-        # This is for troubleshooting only
-        if ADDON.getSetting('debug_logging') == 'true':
-            levels[logging.DEBUG] = self.info_level
+    def set_debug_logging(self, enabled):
+        """ Map DEBUG level to info_level if debug logging setting has been activated. This is for troubleshooting only.
 
+        :param bool enabled:            Whether the debug logging setting has been activated.
+        """
+        self.levels[logging.DEBUG] = self.info_level if enabled else xbmc.LOGDEBUG
+
+    def emit(self, record):
+        """ Emit a log message """
         try:
-            xbmc.log(self.format(record), levels[record.levelno])
+            xbmc.log(self.format(record), self.levels[record.levelno])
         except UnicodeEncodeError:
-            xbmc.log(self.format(record).encode('utf-8', 'ignore'), levels[record.levelno])
+            xbmc.log(self.format(record).encode('utf-8', 'ignore'), self.levels[record.levelno])
 
     def flush(self):
         """ Flush the messages """
 
 
 def config():
-    """ Setup the logger with this handler """
+    """ Setup the logger with this handler. This is called on every invocation, so we pick up changes to the settings. """
     logger = logging.getLogger()
-    logger.setLevel(logging.DEBUG)  # Make sure we pass all messages, Kodi will do some filtering itself.
-    logger.addHandler(KodiLogHandler())
+
+    # Our interpreter can be reused, so we only add our handler once
+    handler = next((handler for handler in logger.handlers if isinstance(handler, KodiLogHandler)), None)
+    if handler is None:
+        handler = KodiLogHandler()
+        logger.addHandler(handler)
+
+    debug_logging = ADDON.getSetting('debug_logging') == 'true'
+    handler.set_debug_logging(debug_logging)
+
+    # Only pass debug messages when they will end up in the Kodi log, so we don't format them for nothing
+    if debug_logging or xbmc.getCondVisibility('System.GetBool(debug.showloginfo)'):
+        logger.setLevel(logging.DEBUG)
+    else:
+        logger.setLevel(logging.INFO)
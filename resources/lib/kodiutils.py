@@ -442,6 +442,22 @@ def get_global_setting(key):
     return result.get('result', {}).get('value')
 
 
+def get_global_settings(keys):
+    """Get multiple Kodi settings in one JSONRPC call"""
+    try:
+        results = jsonrpc(*[dict(method='Settings.GetSettingValue', params=dict(setting=key), id=idx) for idx, key in enumerate(keys)])
+    except (TypeError, ValueError, KeyError):
+        # Some JSON-RPC implementations don't support batches
+        results = None
+
+    if not isinstance(results, list) or not all(isinstance(result, dict) and 'result' in result for result in results):
+        return {key: get_global_setting(key) for key in keys}
+
+    # The replies of a batch can come in any order, so we match them by their id
+    values = {result.get('id'): result.get('result', {}).get('value') for result in results}
+    return {key: values.get(idx) for idx, key in enumerate(keys)}
+
+
 def set_global_setting(key, value):
     """Set a Kodi setting"""
     return jsonrpc(method='Settings.SetSettingValue', params=dict(setting=key, value=value))
@@ -468,13 +484,17 @@ def get_proxies():
     if env_http_proxy:
         return dict(http=env_http_proxy, https=env_https_proxy or env_http_proxy)
 
-    usehttpproxy = get_global_setting('network.usehttpproxy')
+    # Request all proxy settings at once, this is a lot faster than doing a JSONRPC call for each of them
+    settings = get_global_settings(['network.usehttpproxy', 'network.httpproxytype', 'network.httpproxyserver',
+                                    'network.httpproxyport', 'network.httpproxyusername', 'network.httpproxypassword'])
+
+    usehttpproxy = settings.get('network.usehttpproxy')
     if usehttpproxy is not True:
         return None
 
     try:
-        httpproxytype = int(get_global_setting('network.httpproxytype'))
-    except ValueError:
+        httpproxytype = int(settings.get('network.httpproxytype'))
+    except (TypeError, ValueError):
         httpproxytype = 0
 
     socks_supported = has_socks()
@@ -488,10 +508,10 @@ def get_proxies():
 
     proxy = dict(
         scheme=proxy_types[httpproxytype] if 0 <= httpproxytype < 5 else 'http',
-        server=get_global_setting('network.httpproxyserver'),
-        port=get_global_setting('network.httpproxyport'),
-        username=get_global_setting('network.httpproxyusername'),
-        password=get_global_setting('network.httpproxypassword'),
+        server=settings.get('network.httpproxyserver'),
+        port=settings.get('network.httpproxyport'),
+        username=settings.get('network.httpproxyusername'),
+        password=settings.get('network.httpproxypassword'),
     )
 
     if proxy.get('username') and proxy.get('password') and proxy.get('server') and proxy.get('port'):
@@ -619,3 +639,9 @@ def delete(path):
     """Remove a file (using xbmcvfs)"""
     from xbmcvfs import delete as vfsdelete
     return vfsdelete(path)
+
+
+def copy(source, destination):
+    """Copy a file (using xbmcvfs)"""
+    from xbmcvfs import copy as vfscopy
+    return vfscopy(source, destination)
@@ -7,10 +7,9 @@ import logging
 
 from resources.lib import kodiutils
 from resources.lib.kodiutils import TitleItem
+from resources.lib.modules.context import get_context
 from resources.lib.modules.menu import Menu
 from resources.lib.solocoo import VodEpisode, VodMovie, VodSeries
-from resources.lib.solocoo.asset import AssetApi
-from resources.lib.solocoo.auth import AuthApi
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -20,11 +19,7 @@ class Catalog:
 
     def __init__(self):
         """ Initialise object. """
-        auth = AuthApi(username=kodiutils.get_setting('username'),
-                       password=kodiutils.get_setting('password'),
-                       tenant=kodiutils.get_setting('tenant'),
-                       token_path=kodiutils.get_tokens_path())
-        self._api = AssetApi(auth)
+        self._api = get_context().get_asset_api()
 
     def show_overview(self, catalogs=False):
         """ Shows an overview. """
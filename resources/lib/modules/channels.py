@@ -6,15 +6,12 @@ from __future__ import absolute_import, division, unicode_literals
 import logging
 from datetime import datetime, timedelta
 
-import dateutil.tz
-
 from resources.lib import kodiutils
 from resources.lib.kodiutils import TitleItem
 from resources.lib.modules import SETTINGS_ADULT_ALLOW, SETTINGS_ADULT_HIDE
+from resources.lib.modules.context import get_context
 from resources.lib.modules.menu import Menu
 from resources.lib.solocoo import Epg
-from resources.lib.solocoo.asset import AssetApi
-from resources.lib.solocoo.auth import AuthApi
 from resources.lib.solocoo.epg import EpgApi
 
 _LOGGER = logging.getLogger(__name__)
@@ -25,32 +22,16 @@ class Channels:
 
     def __init__(self):
         """ Initialise object. """
-        auth = AuthApi(username=kodiutils.get_setting('username'),
-                       password=kodiutils.get_setting('password'),
-                       tenant=kodiutils.get_setting('tenant'),
-                       token_path=kodiutils.get_tokens_path())
-        self._api = AssetApi(auth)
-        self._epg_api = EpgApi(auth)
+        context = get_context()
+        self._api = context.get_asset_api()
+        self._epg_api = context.get_epg_api()
 
     def show_channels(self):
         """ Shows TV channels. """
         channels = self._api.get_channels(filter_pin=kodiutils.get_setting_int('interface_adult') == SETTINGS_ADULT_HIDE)
 
-        # Load EPG details for the next 6 hours
-        date_now = datetime.now(dateutil.tz.UTC)
-        date_from = date_now.replace(minute=0, second=0, microsecond=0)
-        date_to = date_from + timedelta(hours=6)
-        epg = self._epg_api.get_guide([channel.uid for channel in channels], date_from, date_to)
-        for channel in channels:
-            shows = [show for show in epg.get(channel.uid, {}) if show.end > date_now]
-            try:
-                channel.epg_now = shows[0]
-            except (IndexError, KeyError):
-                pass
-            try:
-                channel.epg_next = shows[1]
-            except (IndexError, KeyError):
-                pass
+        # Make sure we know what is airing now and next
+        self._epg_api.update_now_next(channels)
 
         listing = []
         for item in channels:
@@ -81,6 +62,9 @@ class Channels:
                 kodiutils.end_of_directory()
                 return
 
+        # Make sure we know what is airing now
+        self._epg_api.update_now_next([channel])
+
         listing = []
 
         # Play live
@@ -166,7 +150,7 @@ class Channels:
         # lookup_id = channel_id.split(':')[0]
         # programs = self._epg_api.get_guide([lookup_id], date)
 
-        listing = [Menu.generate_titleitem_epg(item, timeline=True) for item in programs.get(lookup_id)]
+        listing = [Menu.generate_titleitem_epg(item, timeline=True) for item in programs.get(lookup_id, [])]
 
         kodiutils.show_listing(listing, 30013, content='files')
 
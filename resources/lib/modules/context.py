@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+""" Shared API context """
+
+from __future__ import absolute_import, division, unicode_literals
+
+import logging
+import os
+
+from resources.lib import kodiutils
+from resources.lib.solocoo.asset import AssetApi
+from resources.lib.solocoo.auth import AuthApi
+from resources.lib.solocoo.cache import FileCache
+from resources.lib.solocoo.epg import EpgApi
+from resources.lib.solocoo.search import SearchApi
+from resources.lib.solocoo.store import EpgStore
+
+_LOGGER = logging.getLogger(__name__)
+
+# Maximum size of the asset cache on disk
+ASSET_CACHE_SIZE = 5 * 1024 * 1024
+
+
+class ApiContext:
+    """ The API objects of an account. Kodi reuses our interpreter between invocations (reuselanguageinvoker), so we keep
+    this context around to avoid logging in and warming up our caches on every click. """
+
+    def __init__(self, username, password, tenant):
+        """ Initialisation of the class.
+
+        :param str username:            The username of the account.
+        :param str password:            The password of the account.
+        :param str tenant:              The tenant code of the account (eg. tvv).
+        """
+        self.key = (username, password, tenant)
+
+        self._auth = AuthApi(username=username,
+                             password=password,
+                             tenant=tenant,
+                             token_path=kodiutils.get_tokens_path())
+        self._token_mtime = self._get_token_mtime()
+
+        self._asset_api = None
+        self._epg_api = None
+        self._epg_store = None
+        self._search_api = None
+
+    def get_auth(self):
+        """ Return the Authentication object.
+
+        :rtype: resources.lib.solocoo.auth.AuthApi
+        """
+        return self._auth
+
+    def get_asset_api(self):
+        """ Return the Asset API, backed by our asset cache.
+
+        :rtype: resources.lib.solocoo.asset.AssetApi
+        """
+        if self._asset_api is None:
+            self._asset_api = AssetApi(self._auth, cache=FileCache(os.path.join(kodiutils.get_cache_path(), 'assets'), ASSET_CACHE_SIZE))
+        return self._asset_api
+
+    def get_epg_api(self):
+        """ Return the EPG API, backed by our local EPG store and now and next cache.
+
+        :rtype: resources.lib.solocoo.epg.EpgApi
+        """
+        if self._epg_api is None:
+            self._epg_store = EpgStore(os.path.join(kodiutils.get_cache_path(), 'epg.sqlite'))
+            self._epg_api = EpgApi(self._auth,
+                                   store=self._epg_store,
+                                   cache=FileCache(os.path.join(kodiutils.get_cache_path(), 'nownext')))
+        return self._epg_api
+
+    def get_search_api(self):
+        """ Return the Search API.
+
+        :rtype: resources.lib.solocoo.search.SearchApi
+        """
+        if self._search_api is None:
+            self._search_api = SearchApi(self._auth)
+        return self._search_api
+
+    def revalidate(self):
+        """ Make sure our tokens are still usable before we reuse this context. """
+        token_mtime = self._get_token_mtime()
+        if token_mtime != self._token_mtime:
+            # Another process, like the service, has renewed our tokens in the meantime
+            _LOGGER.debug('Reloading the tokens that have been renewed by another process')
+            self._auth.reload()
+
+        # This will only login again when our tokens have expired
+        self._auth.login()
+        self._token_mtime = self._get_token_mtime()
+
+    def close(self):
+        """ Release the resources of this context. """
+        if self._epg_store is not None:
+            self._epg_store.close()
+
+    @staticmethod
+    def _get_token_mtime():
+        """ Return the modification time of our token cache, so we can detect that it was written by another process.
+
+        :rtype: float|None
+        """
+        try:
+            return os.path.getmtime(os.path.join(kodiutils.get_tokens_path(), AuthApi.TOKEN_FILE))
+        except OSError:
+            return None
+
+
+def get_context():
+    """ Return the API context of the configured account. The context is kept between invocations, and is built again when
+    the credentials have been changed in the settings.
+
+    :rtype: ApiContext
+    """
+    key = (kodiutils.get_setting('username'), kodiutils.get_setting('password'), kodiutils.get_setting('tenant'))
+
+    context = getattr(get_context, 'cached', None)
+    if context is not None and context.key == key:
+        context.revalidate()
+        return context
+
+    if context is not None:
+        _LOGGER.debug('The credentials have changed, building a new API context')
+        del get_context.cached
+        context.close()
+
+    get_context.cached = ApiContext(*key)
+    return get_context.cached
+
+
+def close_context():
+    """ Release the API context, when it won't be used anymore. """
+    context = getattr(get_context, 'cached', None)
+    if context is not None:
+        del get_context.cached
+        context.close()
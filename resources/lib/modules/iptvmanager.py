@@ -3,14 +3,17 @@
 
 from __future__ import absolute_import, division, unicode_literals
 
+import json
 import logging
-from collections import defaultdict
+import os
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape, quoteattr
 
 from resources.lib import kodiutils
 from resources.lib.modules import SETTINGS_ADULT_HIDE
+from resources.lib.modules.context import get_context
 from resources.lib.solocoo import Credit
-from resources.lib.solocoo.asset import AssetApi
-from resources.lib.solocoo.auth import AuthApi
+from resources.lib.solocoo.cache import atomic_write
 from resources.lib.solocoo.epg import EpgApi
 
 _LOGGER = logging.getLogger(__name__)
@@ -19,26 +22,44 @@ _LOGGER = logging.getLogger(__name__)
 class IPTVManager:
     """ Interface to IPTV Manager """
 
-    def __init__(self, port):
+    # Mapping of our credit roles to the XMLTV elements, in the order that the DTD requires them
+    XMLTV_CREDITS = [
+        (Credit.ROLE_DIRECTOR, 'director'),
+        (Credit.ROLE_ACTOR, 'actor'),
+        (Credit.ROLE_PRODUCER, 'producer'),
+        (Credit.ROLE_COMPOSER, 'composer'),
+        (Credit.ROLE_PRESENTER, 'presenter'),
+        (Credit.ROLE_GUEST, 'guest'),
+    ]
+
+    def __init__(self, port=None):
         """ Initialize IPTV Manager object. """
         self.port = port
 
-        self._auth = AuthApi(username=kodiutils.get_setting('username'),
-                             password=kodiutils.get_setting('password'),
-                             tenant=kodiutils.get_setting('tenant'),
-                             token_path=kodiutils.get_tokens_path())
+        self._context = get_context()
 
     def via_socket(func):  # pylint: disable=no-self-argument
-        """ Send the output of the wrapped function to socket. """
+        """ Send the output of the wrapped function to socket. The function can return a dict, or a generator of strings. """
 
-        def send(self):
+        def send(self, *args, **kwargs):
             """ Decorator to send data over a socket. """
-            import json
             import socket
+
+            # Build the first chunk before we connect, so we send nothing when the data can't be generated
+            result = func(self, *args, **kwargs)  # pylint: disable=not-callable
+            chunks = iter([json.dumps(result)] if isinstance(result, dict) else result)
+            chunk = next(chunks, None)
+
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             sock.connect(('127.0.0.1', self.port))
             try:
-                sock.sendall(json.dumps(func(self)).encode())  # pylint: disable=not-callable
+                while chunk is not None:
+                    sock.sendall(chunk.encode())
+                    chunk = next(chunks, None)
+            except Exception as exc:
+                # Stop sending, IPTV Manager will notice that the document is incomplete
+                _LOGGER.error('Could not send the data to IPTV Manager: %s', exc)
+                raise
             finally:
                 sock.close()
 
@@ -47,7 +68,7 @@ class IPTVManager:
     @via_socket
     def send_channels(self):
         """ Return JSON-STREAMS formatted information to IPTV Manager. """
-        channel_api = AssetApi(self._auth)
+        channel_api = self._context.get_asset_api()
 
         streams = []
 
@@ -64,49 +85,234 @@ class IPTVManager:
         return dict(version=1, streams=streams)
 
     @via_socket
-    def send_epg(self):
-        """ Return JSON-EPG formatted information to IPTV Manager. """
-        channel_api = AssetApi(self._auth)
-        epg_api = EpgApi(self._auth)
+    def send_epg(self, days_past=None, days_future=None):
+        """ Return JSON-EPG formatted information to IPTV Manager. The EPG is sent channel by channel.
 
-        epg = defaultdict(list)
+        :param int days_past:           The number of days in the past to include. Defaults to the setting.
+        :param int days_future:         The number of days in the future to include. Defaults to the setting.
+        """
+        channels = self._get_channels()
+        date_from, date_to = self._get_horizon(days_past, days_future)
 
-        # Load EPG data
-        channels = channel_api.get_channels(filter_pin=kodiutils.get_setting_int('interface_adult') == SETTINGS_ADULT_HIDE)
-        for date in ['yesterday', 'today', 'tomorrow']:
-            for channel, programs in epg_api.get_guide_with_capi([channel.station_id for channel in channels], date).items():
-                for program in programs:
-                    # Hide these items
-                    if program.title == EpgApi.EPG_NO_BROADCAST:
-                        continue
-
-                    # Construct mapping for credits
-                    program_credits = []
-                    for credit in program.credit:
-                        if credit.role == Credit.ROLE_ACTOR:
-                            program_credits.append({'type': 'actor', 'name': credit.person, 'role': credit.character})
-                        elif credit.role == Credit.ROLE_DIRECTOR:
-                            program_credits.append({'type': 'director', 'name': credit.person})
-                        elif credit.role == Credit.ROLE_PRODUCER:
-                            program_credits.append({'type': 'producer', 'name': credit.person})
-                        elif credit.role == Credit.ROLE_COMPOSER:
-                            program_credits.append({'type': 'composer', 'name': credit.person})
-                        elif credit.role == Credit.ROLE_PRESENTER:
-                            program_credits.append({'type': 'presenter', 'name': credit.person})
-                        elif credit.role == Credit.ROLE_GUEST:
-                            program_credits.append({'type': 'guest', 'name': credit.person})
-
-                    epg[channel].append(dict(
-                        start=program.start.isoformat(),
-                        stop=program.end.isoformat(),
-                        title=program.title,
-                        description=program.description,
-                        subtitle=None,
-                        episode='S%dE%d' % (program.season, program.episode) if program.season and program.episode else None,
-                        genre=program.genres,
-                        image=program.cover,
-                        date=None,
-                        credits=program_credits,
-                        stream=kodiutils.url_for('play_asset', asset_id=program.uid) if program.replay else None))
-
-        return dict(version=1, epg=epg)
+        # Fetch the EPG before we send anything, so IPTV Manager never gets a partial document when this fails
+        self._context.get_epg_api().prefetch_guide_with_capi([channel.station_id for channel in channels], date_from, date_to)
+
+        yield '{"version": 1, "epg": {'
+        for idx, (channel, programs) in enumerate(self._iter_guide(channels, date_from, date_to)):
+            yield '%s%s: %s' % (', ' if idx else '', json.dumps(channel.station_id), json.dumps([
+                self._format_program(program) for program in programs
+            ]))
+        yield '}}'
+
+    def write_xmltv(self, filename=None, days_past=None, days_future=None):
+        """ Write the EPG as an XMLTV file, so it can be used by a PVR add-on without IPTV Manager.
+
+        :param str filename:            The file to write to. Defaults to <addon_id>.xml in the configured folder.
+        :param int days_past:           The number of days in the past to include. Defaults to the setting.
+        :param int days_future:         The number of days in the future to include. Defaults to the setting.
+
+        :returns:                       The filename of the XMLTV file.
+        :rtype: str
+        """
+        if filename is None:
+            filename = self._get_xmltv_filename()
+
+        # The file is written while the EPG is being fetched, and only replaces the old file when it is complete
+        if '://' not in filename:
+            atomic_write(filename, self._iter_xmltv(days_past, days_future))
+            _LOGGER.debug('Written XMLTV file to %s', filename)
+            return filename
+
+        # We can only reach a network share through Kodi, so we write the file locally first and copy it afterwards
+        local_filename = os.path.join(kodiutils.get_cache_path(), filename.rsplit('/', 1)[-1])
+        if not os.path.exists(kodiutils.get_cache_path()):
+            os.makedirs(kodiutils.get_cache_path())
+        atomic_write(local_filename, self._iter_xmltv(days_past, days_future))
+        try:
+            if not kodiutils.copy(local_filename, filename):
+                raise IOError('Could not copy the XMLTV file to %s' % filename)
+        finally:
+            os.remove(local_filename)
+        _LOGGER.debug('Written XMLTV file to %s', filename)
+        return filename
+
+    @staticmethod
+    def _get_xmltv_filename():
+        """ Return the filename of the XMLTV file in the configured folder, or in our profile when no folder is configured.
+
+        :returns:                       The filename as a local path, or as a Kodi URL for a network share (eg. smb://).
+        :rtype: str
+        """
+        path = kodiutils.get_setting('iptv.xmltv_path')
+        if not path:
+            return os.path.join(kodiutils.addon_profile(), kodiutils.addon_id() + '.xml')
+
+        # A special:// path is a local folder, but we can only reach a network share (eg. smb://) through Kodi
+        if path.startswith('special://'):
+            path = kodiutils.translate_path(path)
+        if '://' in path:
+            return path.rstrip('/') + '/' + kodiutils.addon_id() + '.xml'
+        return os.path.join(path, kodiutils.addon_id() + '.xml')
+
+    def _get_channels(self):
+        """ Return the channels that we want to expose to the PVR.
+
+        :rtype: list[resources.lib.solocoo.Channel]
+        """
+        channel_api = self._context.get_asset_api()
+        return channel_api.get_channels(filter_pin=kodiutils.get_setting_int('interface_adult') == SETTINGS_ADULT_HIDE)
+
+    @staticmethod
+    def _get_horizon(days_past=None, days_future=None):
+        """ Return the start and the end of the EPG that we expose to the PVR.
+
+        :param int days_past:           The number of days in the past to include. Defaults to the setting.
+        :param int days_future:         The number of days in the future to include. Defaults to the setting.
+
+        :returns:                       A tuple with the first day and the day after the last day.
+        :rtype: tuple[str, str]
+        """
+        if days_past is None:
+            days_past = kodiutils.get_setting_int('iptv.epg_days_past', 1)
+        if days_future is None:
+            days_future = kodiutils.get_setting_int('iptv.epg_days_future', 1)
+
+        # Load EPG data from the start of the first day until the end of the last day
+        today = datetime.today()
+        date_from = (today - timedelta(days=days_past)).strftime('%Y-%m-%d')
+        date_to = (today + timedelta(days=days_future + 1)).strftime('%Y-%m-%d')
+        return date_from, date_to
+
+    def _iter_guide(self, channels, date_from, date_to):
+        """ Return the EPG of the channels between the specified days.
+
+        :param list[resources.lib.solocoo.Channel] channels: The channels to fetch the EPG for.
+        :param str date_from:           The first day.
+        :param str date_to:             The day after the last day.
+
+        :returns:                       A generator of (channel, programs) tuples.
+        :rtype: iter[tuple[resources.lib.solocoo.Channel, list[resources.lib.solocoo.Epg]]]
+        """
+        epg_api = self._context.get_epg_api()
+
+        channels_by_id = {channel.station_id: channel for channel in channels}
+
+        for station_id, programs in epg_api.iter_guide_with_capi(list(channels_by_id), date_from, date_to):
+            yield channels_by_id[station_id], [
+                program for program in programs
+                if program.title != EpgApi.EPG_NO_BROADCAST  # Hide these items
+            ]
+
+    def _iter_xmltv(self, days_past=None, days_future=None):
+        """ Generate the XMLTV document in chunks, so we never need to keep the whole document in memory.
+
+        :param int days_past:           The number of days in the past to include.
+        :param int days_future:         The number of days in the future to include.
+
+        :returns:                       A generator of strings.
+        :rtype: iter[str]
+        """
+        yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+        yield '<!DOCTYPE tv SYSTEM "xmltv.dtd">\n'
+        yield '<tv generator-info-name=%s>\n' % quoteattr(kodiutils.addon_id())
+
+        # XMLTV wants all channels before the programmes
+        channels = self._get_channels()
+        for channel in channels:
+            yield self._format_xmltv_channel(channel)
+
+        for channel, programs in self._iter_guide(channels, *self._get_horizon(days_past, days_future)):
+            for program in programs:
+                yield self._format_xmltv_program(channel, program)
+
+        yield '</tv>\n'
+
+    @staticmethod
+    def _format_xmltv_channel(channel):
+        """ Format a channel for XMLTV.
+
+        :param resources.lib.solocoo.Channel channel: The channel to format.
+
+        :rtype: str
+        """
+        xml = '<channel id=%s>\n' % quoteattr(channel.station_id)
+        xml += ' <display-name>%s</display-name>\n' % escape(channel.title)
+        if channel.icon:
+            xml += ' <icon src=%s/>\n' % quoteattr(channel.icon)
+        xml += '</channel>\n'
+        return xml
+
+    @classmethod
+    def _format_xmltv_program(cls, channel, program):
+        """ Format a program for XMLTV.
+
+        :param resources.lib.solocoo.Channel channel: The channel of the program.
+        :param resources.lib.solocoo.Epg program: The program to format.
+
+        :rtype: str
+        """
+        xml = '<programme start="%s" stop="%s" channel=%s>\n' % (program.start.strftime('%Y%m%d%H%M%S %z'),
+                                                                  program.end.strftime('%Y%m%d%H%M%S %z'),
+                                                                  quoteattr(channel.station_id))
+        xml += ' <title>%s</title>\n' % escape(program.title or '')
+        if program.description:
+            xml += ' <desc>%s</desc>\n' % escape(program.description)
+
+        program_credits = ''
+        for role, element in cls.XMLTV_CREDITS:
+            for credit in program.credit:
+                if credit.role != role:
+                    continue
+                if role == Credit.ROLE_ACTOR and credit.character:
+                    program_credits += '  <actor role=%s>%s</actor>\n' % (quoteattr(credit.character), escape(credit.person))
+                else:
+                    program_credits += '  <%s>%s</%s>\n' % (element, escape(credit.person), element)
+        if program_credits:
+            xml += ' <credits>\n%s </credits>\n' % program_credits
+
+        for genre in program.genres or []:
+            xml += ' <category>%s</category>\n' % escape(genre)
+        if program.cover:
+            xml += ' <icon src=%s/>\n' % quoteattr(program.cover)
+        if program.season and program.episode:
+            xml += ' <episode-num system="onscreen">S%dE%d</episode-num>\n' % (program.season, program.episode)
+
+        xml += '</programme>\n'
+        return xml
+
+    @staticmethod
+    def _format_program(program):
+        """ Format a program for JSON-EPG.
+
+        :param resources.lib.solocoo.Epg program: The program to format.
+
+        :rtype: dict
+        """
+        # Construct mapping for credits
+        program_credits = []
+        for credit in program.credit:
+            if credit.role == Credit.ROLE_ACTOR:
+                program_credits.append({'type': 'actor', 'name': credit.person, 'role': credit.character})
+            elif credit.role == Credit.ROLE_DIRECTOR:
+                program_credits.append({'type': 'director', 'name': credit.person})
+            elif credit.role == Credit.ROLE_PRODUCER:
+                program_credits.append({'type': 'producer', 'name': credit.person})
+            elif credit.role == Credit.ROLE_COMPOSER:
+                program_credits.append({'type': 'composer', 'name': credit.person})
+            elif credit.role == Credit.ROLE_PRESENTER:
+                program_credits.append({'type': 'presenter', 'name': credit.person})
+            elif credit.role == Credit.ROLE_GUEST:
+                program_credits.append({'type': 'guest', 'name': credit.person})
+
+        return dict(
+            start=program.start.isoformat(),
+            stop=program.end.isoformat(),
+            title=program.title,
+            description=program.description,
+            subtitle=None,
+            episode='S%dE%d' % (program.season, program.episode) if program.season and program.episode else None,
+            genre=program.genres,
+            image=program.cover,
+            date=None,
+            credits=program_credits,
+            stream=kodiutils.url_for('play_asset', asset_id=program.uid) if program.replay else None)
@@ -6,8 +6,6 @@ from __future__ import absolute_import, division, unicode_literals
 import logging
 from datetime import datetime
 
-import dateutil.tz
-
 from resources.lib import kodiutils
 from resources.lib.kodiutils import TitleItem
 from resources.lib.solocoo import Credit
@@ -200,6 +198,7 @@ class Menu:
 
         # Add remaining
         if isinstance(program.available, datetime):
+            import dateutil.tz
             time_left = program.available - datetime.now(dateutil.tz.UTC)
             if time_left.days > 1:
                 plot += '» ' + kodiutils.localize(30208, days=time_left.days) + "\n"  # [B]{days} days[/B] remaining
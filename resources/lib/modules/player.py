@@ -4,13 +4,13 @@
 from __future__ import absolute_import, division, unicode_literals
 
 import logging
+import time
 
 from resources.lib import kodiutils
+from resources.lib.modules.context import get_context
 from resources.lib.modules.menu import Menu
-from resources.lib.solocoo import Channel, Epg, VodEpisode, VodMovie
-from resources.lib.solocoo.asset import AssetApi
-from resources.lib.solocoo.auth import AuthApi
-from resources.lib.solocoo.exceptions import InvalidTokenException, NotAvailableInOfferException, UnavailableException
+from resources.lib.solocoo import Channel, Epg, VodEpisode, VodMovie, util
+from resources.lib.solocoo.exceptions import NotAvailableInOfferException, UnavailableException
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -20,43 +20,25 @@ class Player:
 
     def __init__(self):
         """ Initialise object. """
-        self._auth = AuthApi(username=kodiutils.get_setting('username'),
-                             password=kodiutils.get_setting('password'),
-                             tenant=kodiutils.get_setting('tenant'),
-                             token_path=kodiutils.get_tokens_path())
-        self._api = AssetApi(self._auth)
+        self._api = get_context().get_asset_api()
 
     def play_asset(self, asset_id):
         """ Play an asset (can be an Epg of a Channel).
 
         :param string asset_id:         The ID of the asset to play.
         """
-        # Get asset info
+        start = time.time()
+
         if len(asset_id) == 32:
             # a locId is 32 chars
-            asset = self._api.get_asset_by_locid(asset_id)
-        else:
-            # an asset_id is 40 chars
-            asset = self._api.get_asset(asset_id)
-
-        if isinstance(asset, Epg):
-            item = Menu.generate_titleitem_epg(asset)
-        elif isinstance(asset, Channel):
-            item = Menu.generate_titleitem_channel(asset)
-        elif isinstance(asset, VodMovie):
-            item = Menu.generate_titleitem_vod_movie(asset)
-        elif isinstance(asset, VodEpisode):
-            item = Menu.generate_titleitem_vod_episode(asset)
-        else:
-            raise Exception('Unknown asset type: %s' % asset)
+            asset_id = self._api.get_asset_id_by_locid(asset_id)
 
-        # Get stream info
+        # The stream info only needs the asset_id, so we can request it together with the asset info
         try:
-            stream_info = self._api.get_stream(asset.uid)
-        except InvalidTokenException:
-            # Retry with fresh tokens
-            self._auth.login(True)
-            stream_info = self._api.get_stream(asset.uid)
+            results, _ = util.run_concurrently(dict(
+                stream=lambda: self._api.get_stream(asset_id),
+                asset=lambda: self._api.get_asset(asset_id),
+            ))
         except NotAvailableInOfferException as exc:
             _LOGGER.error(exc)
             kodiutils.ok_dialog(message=kodiutils.localize(30713))  # The video is not available in you subscription.
@@ -69,11 +51,28 @@ class Player:
             kodiutils.end_of_directory()
             return
 
+        asset = results['asset']
+        stream_info = results['stream']
+
+        if isinstance(asset, Epg):
+            item = Menu.generate_titleitem_epg(asset)
+        elif isinstance(asset, Channel):
+            item = Menu.generate_titleitem_channel(asset)
+        elif isinstance(asset, VodMovie):
+            item = Menu.generate_titleitem_vod_movie(asset)
+        elif isinstance(asset, VodEpisode):
+            item = Menu.generate_titleitem_vod_episode(asset)
+        else:
+            raise Exception('Unknown asset type: %s' % asset)
+
         license_key = self._create_license_key(stream_info.drm_license_url, key_headers={'Content-Type': 'application/octet-stream'})
 
         _LOGGER.debug('Starting playing %s with license key %s', stream_info.url, license_key)
         kodiutils.play(stream_info.url, license_key, item.title, item.art_dict, item.info_dict, item.prop_dict)
 
+        # Keep track of how long it takes to start playback
+        _LOGGER.debug('Resolved asset %s for playback in %.3fs', asset_id, time.time() - start)
+
     @staticmethod
     def _create_license_key(key_url, key_type='R', key_headers=None, key_value=None):
         """ Create a license key string that we need for inputstream.adaptive.
@@ -6,10 +6,9 @@ from __future__ import absolute_import, division, unicode_literals
 import logging
 
 from resources.lib import kodiutils
+from resources.lib.modules.context import get_context
 from resources.lib.modules.menu import Menu
 from resources.lib.solocoo import Channel, Epg, EpgSeries
-from resources.lib.solocoo.auth import AuthApi
-from resources.lib.solocoo.search import SearchApi
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -19,11 +18,7 @@ class Search:
 
     def __init__(self):
         """ Initialise object. """
-        auth = AuthApi(username=kodiutils.get_setting('username'),
-                       password=kodiutils.get_setting('password'),
-                       tenant=kodiutils.get_setting('tenant'),
-                       token_path=kodiutils.get_tokens_path())
-        self._search_api = SearchApi(auth)
+        self._search_api = get_context().get_search_api()
 
     def show_search(self, query=None):
         """ Shows the search dialog.
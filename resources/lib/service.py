@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+""" Background service code """
+
+from __future__ import absolute_import, division, unicode_literals
+
+import logging
+import os
+import time
+
+from xbmc import Monitor
+from xbmcaddon import Addon
+
+from resources.lib import kodilogging, kodiutils
+from resources.lib.modules import SETTINGS_ADULT_HIDE
+from resources.lib.modules.context import close_context
+from resources.lib.modules.iptvmanager import IPTVManager
+from resources.lib.solocoo.asset import AssetApi
+from resources.lib.solocoo.auth import AuthApi
+from resources.lib.solocoo.epg import EpgApi
+from resources.lib.solocoo.store import EpgStore
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class BackgroundService(Monitor):
+    """ Background service code """
+
+    # Check our tokens this often (in seconds)
+    CHECK_INTERVAL = 60
+
+    # Renew the tokens when they expire within this many seconds
+    REFRESH_MARGIN = 5 * 60
+
+    # Prefetch the channels and the EPG this often (in seconds)
+    PREFETCH_INTERVAL = 60 * 60
+
+    # Write the XMLTV file again this often (in seconds), when a folder for it has been configured
+    XMLTV_INTERVAL = 6 * 60 * 60
+
+    def __init__(self):
+        Monitor.__init__(self)
+        self._last_prefetch = 0
+        self._last_xmltv = 0
+        self._epg_store = None
+
+    def run(self):
+        """ Background loop for maintenance tasks """
+        _LOGGER.debug('Service started')
+
+        try:
+            while not self.abortRequested():
+                try:
+                    self.refresh()
+                except Exception as exc:  # pylint: disable=broad-except
+                    # Never let the service die, we will try again later
+                    _LOGGER.warning('Background refresh failed: %s', exc)
+
+                # Stop when abort requested
+                if self.waitForAbort(self.CHECK_INTERVAL):
+                    break
+        finally:
+            if self._epg_store is not None:
+                self._epg_store.close()
+            close_context()
+
+        _LOGGER.debug('Service stopped')
+
+    def onSettingsChanged(self):  # pylint: disable=invalid-name
+        """ Callback when a setting has changed """
+        # Reload the settings, and prefetch again since the credentials might have changed
+        kodiutils.ADDON = Addon()
+        kodilogging.ADDON = Addon()
+        kodilogging.config()
+        self._last_prefetch = 0
+        self._last_xmltv = 0
+
+    def refresh(self):
+        """ Renew our tokens before they expire, and prefetch data that we will need. """
+        if not kodiutils.get_setting('username') or not kodiutils.get_setting('password'):
+            # We can't do anything without credentials
+            return
+
+        # We load the tokens from disk every time, since the add-on might have renewed them in the meantime.
+        # This will also login when our tokens have expired.
+        auth = AuthApi(username=kodiutils.get_setting('username'),
+                       password=kodiutils.get_setting('password'),
+                       tenant=kodiutils.get_setting('tenant'),
+                       token_path=kodiutils.get_tokens_path())
+
+        # Renew our tokens before they expire, so the add-on never needs to wait for this
+        if not auth.get_tokens().is_valid_token(self.REFRESH_MARGIN):
+            _LOGGER.debug('Renewing tokens that are about to expire')
+            auth.login(force=True)
+
+            # A new session also needs new entitlements
+            auth.list_entitlements()
+
+        if time.time() - self._last_prefetch >= self.PREFETCH_INTERVAL:
+            self.prefetch(auth)
+            self._last_prefetch = time.time()
+
+        if kodiutils.get_setting('iptv.xmltv_path') and time.time() - self._last_xmltv >= self.XMLTV_INTERVAL:
+            self.write_xmltv()
+            self._last_xmltv = time.time()
+
+    def prefetch(self, auth):
+        """ Prefetch the channels, the entitlements and the EPG of today in the cache.
+
+        :param resources.lib.solocoo.auth.AuthApi auth: The Authentication object
+        """
+        _LOGGER.debug('Prefetching channels and EPG')
+        channels = AssetApi(auth).get_channels(filter_pin=kodiutils.get_setting_int('interface_adult') == SETTINGS_ADULT_HIDE)
+
+        # We keep the store open for the life of the service
+        if self._epg_store is None:
+            self._epg_store = EpgStore(os.path.join(kodiutils.get_cache_path(), 'epg.sqlite'))
+
+        # We only need to fill the store, so we don't read the programs back
+        epg_api = EpgApi(auth, store=self._epg_store)
+        epg_api.prefetch_guide_with_capi([channel.station_id for channel in channels if channel.station_id], 'today')
+
+    def write_xmltv(self):
+        """ Write the XMLTV file again, so the PVR add-on that reads it doesn't run out of programs. """
+        _LOGGER.debug('Writing the XMLTV file')
+        IPTVManager().write_xmltv()
+
+
+def run():
+    """ Run the BackgroundService """
+    kodilogging.config()
+    BackgroundService().run()
@@ -4,10 +4,48 @@ from __future__ import absolute_import, division, unicode_literals
 
 SOLOCOO_API = 'https://tvapi.solocoo.tv/v1'
 
+# Shared instances of strings that are repeated a lot, like genres, formats and roles
+_STRINGS = {}
 
-class Channel:
+
+def intern_string(value):
+    """ Return a shared instance of a string, so we don't keep thousands of copies of the same genre in memory.
+
+    :param str value:                   The string to intern.
+
+    :rtype: str
+    """
+    if value is None:
+        return None
+    return _STRINGS.setdefault(value, value)
+
+
+def intern_strings(values):
+    """ Return a list with shared instances of the strings.
+
+    :param list[str] values:            The strings to intern.
+
+    :rtype: list[str]
+    """
+    if values is None:
+        return None
+    return [intern_string(value) for value in values]
+
+
+class _Model(object):  # pylint: disable=useless-object-inheritance
+    """ Base class for our objects. We use __slots__ since we keep a lot of these in memory. """
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "%r" % {key: getattr(self, key) for key in self.__slots__}
+
+
+class Channel(_Model):
     """ Channel Object """
 
+    __slots__ = ('uid', 'station_id', 'title', 'icon', 'preview', 'number', 'epg_now', 'epg_next', 'replay', 'radio', 'available', 'pin')
+
     def __init__(self, uid, station_id, title, icon, preview, number, epg_now=None, epg_next=None, replay=False, radio=False, available=None, pin=None):
         """
         :param Epg epg_now:     The currently playing program on this channel.
@@ -27,17 +65,16 @@ class Channel:
         self.available = available
         self.pin = pin
 
-    def __repr__(self):
-        return "%r" % self.__dict__
-
     def get_combi_id(self):
         """ Return a combination of the uid and the station_id. """
         return "%s:%s" % (self.uid, self.station_id)
 
 
-class StreamInfo:
+class StreamInfo(_Model):
     """ Stream information """
 
+    __slots__ = ('url', 'protocol', 'drm_protocol', 'drm_license_url', 'drm_certificate')
+
     def __init__(self, url, protocol, drm_protocol, drm_license_url, drm_certificate):
         self.url = url
         self.protocol = protocol
@@ -45,13 +82,13 @@ class StreamInfo:
         self.drm_license_url = drm_license_url
         self.drm_certificate = drm_certificate
 
-    def __repr__(self):
-        return "%r" % self.__dict__
-
 
-class Epg:
+class Epg(_Model):
     """ Program object """
 
+    __slots__ = ('uid', 'title', 'description', 'cover', 'preview', 'start', 'end', 'duration', 'age', 'channel_id', 'formats', 'genres',
+                 'replay', 'restart', 'series_id', 'season', 'episode', 'credit', 'available')
+
     def __init__(self, uid, title, description, cover, preview, start, end, duration, channel_id, formats, genres, replay,
                  restart, age, series_id=None, season=None, episode=None, credit=None, available=None):
         """
@@ -70,8 +107,8 @@ class Epg:
         self.age = age
         self.channel_id = channel_id
 
-        self.formats = formats
-        self.genres = genres
+        self.formats = intern_strings(formats)
+        self.genres = intern_strings(genres)
 
         self.replay = replay
         self.restart = restart
@@ -84,13 +121,12 @@ class Epg:
 
         self.available = available
 
-    def __repr__(self):
-        return "%r" % self.__dict__
-
 
-class EpgSeries:
+class EpgSeries(_Model):
     """ EpgSeries object """
 
+    __slots__ = ('uid', 'title', 'description', 'cover', 'preview', 'age', 'channel_id', 'formats', 'genres')
+
     def __init__(self, uid, title, description, cover, preview, channel_id, formats, genres, age):
         self.uid = uid
         self.title = title
@@ -101,16 +137,15 @@ class EpgSeries:
         self.age = age
         self.channel_id = channel_id
 
-        self.formats = formats
-        self.genres = genres
-
-    def __repr__(self):
-        return "%r" % self.__dict__
+        self.formats = intern_strings(formats)
+        self.genres = intern_strings(genres)
 
 
-class Credit:
+class Credit(_Model):
     """ Credit object """
 
+    __slots__ = ('role', 'person', 'character')
+
     ROLE_ACTOR = 'Actor'
     ROLE_COMPOSER = 'Composer'
     ROLE_DIRECTOR = 'Director'
@@ -119,29 +154,27 @@ class Credit:
     ROLE_PRODUCER = 'Producer'
 
     def __init__(self, role, person, character=None):
-        self.role = role
+        self.role = intern_string(role)
         self.person = person
         self.character = character
 
-    def __repr__(self):
-        return "%r" % self.__dict__
-
 
-class VodCatalog:
+class VodCatalog(_Model):
     """ Catalog object for VOD """
 
+    __slots__ = ('uid', 'title', 'cover')
+
     def __init__(self, uid, title, cover):
         self.uid = uid
         self.title = title
         self.cover = cover
 
-    def __repr__(self):
-        return "%r" % self.__dict__
-
 
-class VodGenre:
+class VodGenre(_Model):
     """ Genre object for VOD """
 
+    __slots__ = ('uid', 'title', 'query')
+
     GENRE_MAP = {
         "sg.ui.genre.actionadventure": "Action & Adventure",
         "sg.ui.genre.carsmotors": "Cars & Motors",
@@ -164,13 +197,12 @@ class VodGenre:
         # Fallback to something based on the id
         return label.split('.')[-1].title()
 
-    def __repr__(self):
-        return "%r" % self.__dict__
-
 
-class VodMovie:
+class VodMovie(_Model):
     """ Movie object for VOD """
 
+    __slots__ = ('uid', 'title', 'year', 'duration', 'age', 'cover', 'preview', 'credit', 'trailer', 'available')
+
     def __init__(self, uid, title, year, duration, age, cover, preview, credit=None, trailer=None, available=None):
         """
 
@@ -188,13 +220,12 @@ class VodMovie:
         self.trailer = trailer
         self.available = available
 
-    def __repr__(self):
-        return "%r" % self.__dict__
-
 
-class VodSeries:
+class VodSeries(_Model):
     """ Series object for VOD """
 
+    __slots__ = ('uid', 'title', 'year', 'age', 'cover', 'preview', 'credit', 'available')
+
     def __init__(self, uid, title, year, age, cover, preview, credit=None, available=None):
         """
 
@@ -210,13 +241,12 @@ class VodSeries:
         self.credit = credit or []
         self.available = available
 
-    def __repr__(self):
-        return "%r" % self.__dict__
-
 
-class VodSeason:
+class VodSeason(_Model):
     """ Season object for VOD """
 
+    __slots__ = ('uid', 'title', 'query')
+
     def __init__(self, uid, title, query):
         """
 
@@ -226,13 +256,12 @@ class VodSeason:
         self.title = title
         self.query = query
 
-    def __repr__(self):
-        return "%r" % self.__dict__
-
 
-class VodEpisode:
+class VodEpisode(_Model):
     """ Episode object for VOD """
 
+    __slots__ = ('uid', 'title', 'year', 'duration', 'age', 'cover', 'preview', 'series_id', 'season', 'episode', 'credit')
+
     def __init__(self, uid, title, year, duration, age, cover, preview, series_id, season, episode, credit=None):
         """
 
@@ -251,6 +280,3 @@ class VodEpisode:
         self.episode = episode
 
         self.credit = credit or []
-
-    def __repr__(self):
-        return "%r" % self.__dict__
@@ -24,15 +24,28 @@ ASSET_TYPE_VOD_SERIES = 'VODSeries'
 class AssetApi:
     """ Solocoo Asset API """
 
-    def __init__(self, auth):
+    # Serve these responses from the cache for this many seconds
+    CACHE_TTL_CHANNEL_LISTING = 86400
+    CACHE_TTL_COLLECTIONS = 3600
+    CACHE_TTL_OWNERS = 86400
+
+    # Keep the metadata of an asset for this many seconds
+    CACHE_TTL_ASSET = 6 * 3600
+
+    def __init__(self, auth, cache=None):
         """ Initialisation of the class.
 
         :param resources.lib.solocoo.auth.AuthApi auth: The Authentication object
+        :param resources.lib.solocoo.cache.FileCache cache: A cache for the assets and the locId mapping. When None, we don't cache.
         """
         self._auth = auth
+        self._cache = cache
         self._tokens = self._auth.get_tokens()
         self._tenant = self._auth.get_tenant()
 
+        # The duration in seconds of the requests of the last call to get_channels, by name
+        self.timings = {}
+
     def get_channels(self, filter_unavailable=True, filter_pin=False):
         """ Get all channels.
 
@@ -42,15 +55,47 @@ class AssetApi:
         :returns:                       A list of all channels.
         :rtype: list[resources.lib.solocoo.Channel]
         """
-        entitlements = self._auth.list_entitlements()
-        offers = entitlements.get('offers', [])
+        # These requests don't depend on each other, so we can do them at the same time
+        results, self.timings = util.run_concurrently(dict(
+            offers=self._auth.get_offers,
+            bouquet=self._get_bouquet,
+            station_ids=self._get_station_ids,
+        ))
+        offers = util.EntitlementChecker(results['offers'])
+        data = results['bouquet']
+        station_ids = results['station_ids']
 
-        # Fetch channel listing from TV API
-        reply = util.http_get(SOLOCOO_API + '/bouquet', token_bearer=self._tokens.jwt_token)
-        data = json.loads(reply.text)
+        # Parse list to Channel objects
+        channels = [
+            parse_channel(channel.get('assetInfo', {}), offers, station_ids.get(channel.get('assetInfo', {}).get('params', {}).get('lcn')))
+            for channel in data.get('channels', []) if channel.get('alias', False) is False
+        ]
+
+        # Filter unavailable channels
+        if filter_unavailable:
+            channels = [channel for channel in channels if channel.available is not False]
 
-        # Fetch channel listing from CAPI
-        # We need this for the stationid that we can use to fetch a better EPG
+        # Filter PIN protected channels
+        if filter_pin:
+            channels = [channel for channel in channels if channel.pin is False]
+
+        return channels
+
+    def _get_bouquet(self):
+        """ Fetch the channel listing from the TV API.
+
+        :rtype: dict
+        """
+        # This isn't cached, since it contains the program that is airing now on every channel
+        reply = util.http_get(SOLOCOO_API + '/bouquet', token_bearer=self._tokens.jwt_token, auth=self._auth)
+        return json.loads(reply.content)
+
+    def _get_station_ids(self):
+        """ Fetch the channel listing from CAPI. We need this for the stationid that we can use to fetch a better EPG.
+
+        :returns:                       A mapping of channel numbers to station ids.
+        :rtype: dict[int, str]
+        """
         capi_reply = util.http_get(
             'https://{domain}/{env}/capi.aspx'.format(domain=self._tenant.get('domain'), env=self._tenant.get('env')),
             params={
@@ -66,25 +111,12 @@ class AssetApi:
                 'lng': 'nl_BE',
                 'streams': 15,
             },
-            token_cookie=self._tokens.aspx_token)
-        capi_data = json.loads(capi_reply.text)
-        station_ids = {row.get('number'): str(row.get('stationid')) for row in capi_data[0][1]}
-
-        # Parse list to Channel objects
-        channels = [
-            parse_channel(channel.get('assetInfo', {}), offers, station_ids.get(channel.get('assetInfo', {}).get('params', {}).get('lcn')))
-            for channel in data.get('channels', []) if channel.get('alias', False) is False
-        ]
-
-        # Filter unavailable channels
-        if filter_unavailable:
-            channels = [channel for channel in channels if channel.available is not False]
-
-        # Filter PIN protected channels
-        if filter_pin:
-            channels = [channel for channel in channels if channel.pin is False]
-
-        return channels
+            token_cookie=self._tokens.aspx_token,
+            auth=self._auth,
+            cache_ttl=self.CACHE_TTL_CHANNEL_LISTING,
+            cache_scope=self._auth.get_cache_scope())
+        capi_data = json.loads(capi_reply.content)
+        return {row.get('number'): str(row.get('stationid')) for row in capi_data[0][1]}
 
     def get_asset(self, asset_id):
         """ Get channel information for the requested asset.
@@ -94,9 +126,19 @@ class AssetApi:
         :returns:                       The requested asset.
         :rtype: resources.lib.solocoo.Channel|resources.lib.solocoo.Epg|resources.lib.solocoo.VodMovie|resources.lib.solocoo.VodSeries|resources.lib.solocoo.VodEpisode
         """
-        reply = util.http_get(SOLOCOO_API + '/assets/{asset_id}'.format(asset_id=asset_id),
-                              token_bearer=self._tokens.jwt_token)
-        data = json.loads(reply.text)
+        cache_key = self._cache.make_key('asset', asset_id, self._auth.get_cache_scope()) if self._cache else None
+        entry = self._cache.get(cache_key) if self._cache else None
+        if entry is not None and self._cache.is_fresh(entry):
+            _LOGGER.debug('Serving asset %s from the cache', asset_id)
+            data = entry.get('data')
+        else:
+            reply = util.http_get(SOLOCOO_API + '/assets/{asset_id}'.format(asset_id=asset_id),
+                                  token_bearer=self._tokens.jwt_token, auth=self._auth)
+            data = json.loads(reply.content)
+
+            # A channel also contains what is airing now, so we don't keep it
+            if self._cache and data.get('type') != ASSET_TYPE_CHANNEL:
+                self._cache.set(cache_key, data, self.CACHE_TTL_ASSET)
 
         if data.get('type') == ASSET_TYPE_EPG:
             return parse_epg(data)
@@ -118,13 +160,29 @@ class AssetApi:
         raise Exception('Unknown asset type: %s' % data.get('type'))
 
     def get_asset_by_locid(self, loc_id):
-        """ Convert a locId to a assetId.
+        """ Get the asset with the specified locId.
 
         :param str loc_id:              The locID of the asset.
 
         :returns:                       The matching Asset.
         :rtype: resources.lib.solocoo.Channel|resources.lib.solocoo.Epg
         """
+        return self.get_asset(self.get_asset_id_by_locid(loc_id))
+
+    def get_asset_id_by_locid(self, loc_id):
+        """ Convert a locId to a assetId.
+
+        :param str loc_id:              The locID of the asset.
+
+        :returns:                       The ID of the matching asset.
+        :rtype: str
+        """
+        # A locId always points to the same asset, so this never expires
+        cache_key = self._cache.make_key('locid', loc_id, self._auth.get_cache_scope()) if self._cache else None
+        entry = self._cache.get(cache_key) if self._cache else None
+        if entry is not None:
+            return entry.get('data')
+
         reply = util.http_get(
             'https://{domain}/{env}/capi.aspx'.format(domain=self._tenant.get('domain'), env=self._tenant.get('env')),
             params={
@@ -132,9 +190,13 @@ class AssetApi:
                 'locId': loc_id,
                 'type': 'EPGProgram',
             },
-            token_cookie=self._tokens.aspx_token)
-        data = json.loads(reply.text)
-        return self.get_asset(data.get('assetId'))
+            token_cookie=self._tokens.aspx_token, auth=self._auth)
+        data = json.loads(reply.content)
+
+        if self._cache and data.get('assetId'):
+            self._cache.set(cache_key, data.get('assetId'))
+
+        return data.get('assetId')
 
     def query_assets(self, query):
         """ Get a list of assets of the specified query.
@@ -143,8 +205,7 @@ class AssetApi:
         :returns:                       A list of Assets.
         :rtype: list[resources.lib.solocoo.VodMovie|resources.lib.solocoo.VodSeries|resources.lib.solocoo.VodEpisode]
         """
-        entitlements = self._auth.list_entitlements()
-        offers = entitlements.get('offers', [])
+        offers = util.EntitlementChecker(self._auth.get_offers())
 
         # Execute query
         reply = util.http_get(SOLOCOO_API + '/assets',
@@ -152,8 +213,8 @@ class AssetApi:
                                   'query': query,
                                   'limit': 1000,
                               },
-                              token_bearer=self._tokens.jwt_token)
-        data = json.loads(reply.text)
+                              token_bearer=self._tokens.jwt_token, auth=self._auth)
+        data = json.loads(reply.content)
 
         # Parse list to VodMovie or VodSeries objects
         assets = []
@@ -205,6 +266,7 @@ class AssetApi:
             reply = util.http_post(
                 SOLOCOO_API + '/assets/{asset_id}/play'.format(asset_id=asset_id),
                 token_bearer=self._tokens.jwt_token,
+                auth=self._auth,
                 data={
                     "player": {
                         "name": "Bitmovin",
@@ -226,7 +288,7 @@ class AssetApi:
                 raise UnavailableException
             raise
 
-        data = json.loads(reply.text)
+        data = json.loads(reply.content)
 
         stream = StreamInfo(
             url=data.get('url'),
@@ -250,6 +312,7 @@ class AssetApi:
             util.http_post(
                 SOLOCOO_API + '/pin/parental/verify',
                 token_bearer=self._tokens.jwt_token,
+                auth=self._auth,
                 data={
                     "pin": pin,
                 }
@@ -266,8 +329,11 @@ class AssetApi:
         """
         # Fetch owner info from TV API
         reply = util.http_get(SOLOCOO_API + '/owners',
-                              token_bearer=self._tokens.jwt_token)
-        owners = json.loads(reply.text)
+                              token_bearer=self._tokens.jwt_token,
+                              auth=self._auth,
+                              cache_ttl=self.CACHE_TTL_OWNERS,
+                              cache_scope=self._auth.get_cache_scope())
+        owners = json.loads(reply.content)
 
         # Create a dict with the owner id and the preferred image (png, dark)
         owner_images = {owner.get('id'): next((icon.get('url') for icon in owner.get('icons') if icon.get('format') == 'png' and icon.get('bg') == 'dark'), None)
@@ -279,8 +345,11 @@ class AssetApi:
                                   'group': 'owner,genre',
                                   'sort': 'newest'
                               },
-                              token_bearer=self._tokens.jwt_token)
-        data = json.loads(reply.text)
+                              token_bearer=self._tokens.jwt_token,
+                              auth=self._auth,
+                              cache_ttl=self.CACHE_TTL_COLLECTIONS,
+                              cache_scope=self._auth.get_cache_scope())
+        data = json.loads(reply.content)
 
         # Parse list to Channel objects
         collections = [
@@ -307,16 +376,22 @@ class AssetApi:
                                       'group': 'genre',
                                       'sort': 'newest'
                                   },
-                                  token_bearer=self._tokens.jwt_token)
+                                  token_bearer=self._tokens.jwt_token,
+                                  auth=self._auth,
+                                  cache_ttl=self.CACHE_TTL_COLLECTIONS,
+                                  cache_scope=self._auth.get_cache_scope())
         else:
             reply = util.http_get(SOLOCOO_API + '/collections/movies',
                                   params={
                                       'group': 'genre',
                                       'sort': 'newest'
                                   },
-                                  token_bearer=self._tokens.jwt_token)
+                                  token_bearer=self._tokens.jwt_token,
+                                  auth=self._auth,
+                                  cache_ttl=self.CACHE_TTL_COLLECTIONS,
+                                  cache_scope=self._auth.get_cache_scope())
 
-        data = json.loads(reply.text)
+        data = json.loads(reply.content)
 
         # Parse list to Genre objects
         collections = [
@@ -340,8 +415,11 @@ class AssetApi:
                                   'sort': 'default',
                                   'asset': asset,
                               },
-                              token_bearer=self._tokens.jwt_token)
-        data = json.loads(reply.text)
+                              token_bearer=self._tokens.jwt_token,
+                              auth=self._auth,
+                              cache_ttl=self.CACHE_TTL_COLLECTIONS,
+                              cache_scope=self._auth.get_cache_scope())
+        data = json.loads(reply.content)
 
         # Parse list to Season objects
         collections = [
@@ -7,6 +7,7 @@ import json
 import logging
 import os
 import re
+import threading
 import time
 import uuid
 from hashlib import md5
@@ -14,6 +15,7 @@ from hashlib import md5
 from requests import HTTPError
 
 from resources.lib.solocoo import SOLOCOO_API, util
+from resources.lib.solocoo.cache import FileLock, atomic_write
 from resources.lib.solocoo.config import TENANTS
 from resources.lib.solocoo.exceptions import InvalidLoginException, InvalidTokenException
 
@@ -50,43 +52,76 @@ class AccountStorage:
     # Credentials hash
     hash = ''
 
-    def is_valid_token(self):
+    def is_valid_token(self, margin=0):
         """ Validate the JWT to see if it's still valid.
 
+        :param int margin:              The number of seconds that the token should at least stay valid.
+
         :rtype: boolean
         """
         if not self.jwt_token:
             # We have no token
             return False
 
-        try:
-            # Verify if token is still valid
-            token = jwt.decode(self.jwt_token, algorithms=['HS256'], options={
-                'verify_signature': False,
-                'verify_aud': False,
-                'verify_nbf': False,
-                'verify_exp': True,
-            })
-
-            # NOTE: verify_signature=False combined with verify_exp=True doesn't work on pyjwt 2.0.0, see https://github.com/jpadilla/pyjwt/issues/599
-            from calendar import timegm
-            from datetime import datetime
-            now = timegm(datetime.utcnow().utctimetuple())
-            if int(token["exp"]) < now:
-                raise Exception('Signature has expired')
-
-        except Exception as exc:  # pylint: disable=broad-except
-            _LOGGER.debug('JWT is NOT valid: %s', exc)
+        expiry = self.get_token_expiry()
+        if expiry - margin <= time.time():
+            _LOGGER.debug('JWT is NOT valid: it expires at %d', expiry)
             return False
 
         _LOGGER.debug('JWT is valid')
         return True
 
+    def get_token_expiry(self):
+        """ Return the time when the JWT expires.
+
+        :returns:                       The expiry time as a unix timestamp, or 0 when we have no valid token.
+        :rtype: int
+        """
+        if not self.jwt_token:
+            return 0
+        return _decode_token_expiry(self.jwt_token)
+
+
+def _decode_token_expiry(jwt_token):
+    """ Decode the expiry time of a JWT. We keep the result, so we only decode the same token once.
+
+    :param str jwt_token:               The JWT to decode.
+
+    :returns:                           The expiry time as a unix timestamp, or 0 when the token is invalid.
+    :rtype: int
+    """
+    cached = getattr(_decode_token_expiry, 'cached', None)
+    if cached is not None and cached[0] == jwt_token:
+        return cached[1]
+
+    try:
+        token = jwt.decode(jwt_token, algorithms=['HS256'], options={
+            'verify_signature': False,
+            'verify_aud': False,
+            'verify_nbf': False,
+            'verify_exp': False,
+        })
+        expiry = int(token['exp'])
+    except Exception as exc:  # pylint: disable=broad-except
+        _LOGGER.debug('Could not decode the JWT: %s', exc)
+        expiry = 0
+
+    _decode_token_expiry.cached = (jwt_token, expiry)
+    return expiry
+
 
 class AuthApi:
     """ Solocoo Auth API """
 
     TOKEN_FILE = 'auth-tokens.json'
+    ENTITLEMENTS_FILE = 'auth-entitlements.json'
+
+    # Renew the JWT when it expires within this many seconds, so we never use a token that expires during a request
+    RENEW_MARGIN = 60
+
+    # A complete login makes up to 7 requests that each time out after util.REQUEST_TIMEOUT seconds. Another process waits
+    # this long for the login lock, and only a process that has crashed holds it longer than this.
+    LOGIN_LOCK_STALE = 10 * util.REQUEST_TIMEOUT
 
     def __init__(self, username, password, tenant, token_path):
         """ Initialisation of the class.
@@ -104,6 +139,11 @@ class AuthApi:
             raise Exception('Invalid tenant: %s' % tenant)
 
         self._token_path = token_path
+        self._entitlements = None
+        self._offers = None
+
+        # Requests that run in parallel can have their tokens rejected at the same time, but we only want to renew them once
+        self._renew_lock = threading.Lock()
 
         # Load existing account data
         self._account = AccountStorage()
@@ -121,6 +161,13 @@ class AuthApi:
         """ Return the tenant information. """
         return self._tenant
 
+    def get_cache_scope(self):
+        """ Return a key that identifies this account, so cached data is never shared between accounts.
+
+        :rtype: str
+        """
+        return '%s:%s' % (self._tenant.get('app'), self._account.hash)
+
     def login(self, force=False):
         """ Make a login request.
 
@@ -136,12 +183,75 @@ class AuthApi:
             self._account.hash = new_hash
             self._account.challenge_id = None
             self._account.challenge_secret = None
+            self._account.aspx_token = None
+            self._clear_entitlements()
             force = True
 
         # Use cached token if it is still valid
-        if not force and self._account.is_valid_token():
+        if not force and self._account.is_valid_token(self.RENEW_MARGIN):
             return self._account
 
+        # Only one process should login at the same time, the others can use the tokens it has obtained
+        jwt_token = self._account.jwt_token
+        with FileLock(os.path.join(self._token_path, self.TOKEN_FILE + '.lock'),
+                      timeout=self.LOGIN_LOCK_STALE, stale_after=self.LOGIN_LOCK_STALE):
+            if self._use_renewed_tokens(jwt_token):
+                _LOGGER.debug('Using the tokens that another process has obtained')
+                return self._account
+
+            return self._authenticate()
+
+    def renew_tokens(self, jwt_token):
+        """ Renew our tokens after they have been rejected. When this is called for the same token from multiple threads, we
+        only renew them once.
+
+        :param str jwt_token:           The JWT that has been rejected.
+
+        :returns:                       An object containing tokens.
+        :rtype: AccountStorage
+        """
+        with self._renew_lock:
+            if self._account.jwt_token == jwt_token:
+                self.login(force=True)
+        return self._account
+
+    def _authenticate(self):
+        """ Request new tokens. We only go through the complete login flow when our ASPX cookie can't be reused.
+
+        :returns:                       An object containing tokens.
+        :rtype: AccountStorage
+        """
+        # Try to reuse the ASPX cookie of our previous session first, so we only need to request a new SAPI token and JWT
+        sapi_token = None
+        if self._account.aspx_token:
+            try:
+                sapi_token = self._get_sapi_token(self._account.aspx_token)
+            except (HTTPError, InvalidTokenException, ValueError) as exc:
+                _LOGGER.debug('Could not reuse our ASPX cookie: %s', exc)
+
+        if not sapi_token:
+            self._renew_aspx_cookie()
+
+            # And finally, get our sapi token by using our stored ASPXAUTH token
+            # The sapi token token seems to expires in 30 minutes
+            sapi_token = self._get_sapi_token(self._account.aspx_token)
+
+        # Request JWT token
+        # The JWT token also seems to expires in 30 minutes
+        self._account.jwt_token = self._get_jwt_token(sapi_token,
+                                                      self._account.device_name,
+                                                      self._account.device_serial)
+
+        # Save the tokens we have in a cache
+        self._save_cache()
+
+        # Our entitlements might have changed with this new session
+        self._clear_entitlements()
+
+        return self._account
+
+    def _renew_aspx_cookie(self):
+        """ Request a new ASPX cookie, and a new challenge when we need one. """
         if not self._account.challenge_id or not self._account.challenge_secret:
             # We don't have a challenge_id or challenge_secret, so we need to request one
             # This challenge can be kept for a longer time
@@ -175,21 +285,6 @@ class AuthApi:
             else:
                 raise
 
-        # And finally, get our sapi token by using our stored ASPXAUTH token
-        # The sapi token token seems to expires in 30 minutes
-        sapi_token = self._get_sapi_token(self._account.aspx_token)
-
-        # Request JWT token
-        # The JWT token also seems to expires in 30 minutes
-        self._account.jwt_token = self._get_jwt_token(sapi_token,
-                                                      self._account.device_name,
-                                                      self._account.device_serial)
-
-        # Save the tokens we have in a cache
-        self._save_cache()
-
-        return self._account
-
     def _check_credentials_change(self):
         """ Check if credentials have changed.
 
@@ -239,7 +334,7 @@ class AuthApi:
         reply = util.http_post('https://{domain}/{env}/challenge.aspx'.format(domain=self._tenant.get('domain'),
                                                                               env=self._tenant.get('env')),
                                data=data)
-        challenge = json.loads(reply.text)
+        challenge = json.loads(reply.content)
 
         return challenge.get('id'), challenge.get('secret')
 
@@ -324,7 +419,7 @@ class AuthApi:
                                                                                    env=self._tenant.get('env')),
                               token_cookie=aspx_token)
 
-        return json.loads(reply.text).get('ssotoken')
+        return json.loads(reply.content).get('ssotoken')
 
     def _get_jwt_token(self, sapi_token, device_name, device_serial):
         """ Get a JWT token.
@@ -349,7 +444,7 @@ class AuthApi:
                                    featureLevel='1',
                                    environment='p',
                                ))
-        return json.loads(reply.text).get('token')
+        return json.loads(reply.content).get('token')
 
     def get_tokens(self):
         """ Return the tokens.
@@ -359,6 +454,16 @@ class AuthApi:
         """
         return self._account
 
+    def reload(self):
+        """ Load the tokens from the cache again, since another process might have renewed them. """
+        jwt_token = self._account.jwt_token
+        self._load_cache()
+
+        # The entitlements we keep in memory belong to the previous session
+        if self._account.jwt_token != jwt_token:
+            self._entitlements = None
+            self._offers = None
+
     def logout(self):
         """ Clear the session tokens. """
         self._account.aspx_token = None
@@ -367,19 +472,41 @@ class AuthApi:
         self._account.challenge_secret = None
 
         self._save_cache()
+        self._clear_entitlements()
 
     def list_entitlements(self):
+        """ Return a list of entitlements on this account.
+
+        The entitlements are cached until the JWT expires, or until we login again.
+
+        :rtype: dict
+        """
+        if self._entitlements is None:
+            self._entitlements = self._load_entitlements()
+
+        if self._entitlements is None:
+            self._entitlements = self._fetch_entitlements()
+            self._save_entitlements(self._entitlements)
+
+        return self._entitlements
+
+    def get_offers(self):
+        """ Return the offers on this account, ready to be matched against the deals of an item.
+
+        :rtype: frozenset[str]
+        """
+        if self._offers is None:
+            self._offers = frozenset(self.list_entitlements().get('offers', []))
+        return self._offers
+
+    def _fetch_entitlements(self):
         """ Fetch a list of entitlements on this account.
 
         :rtype: dict
         """
-        try:
-            reply = util.http_get(SOLOCOO_API + '/entitlements', token_bearer=self._account.jwt_token)
-        except InvalidTokenException:
-            self.login(True)
-            reply = util.http_get(SOLOCOO_API + '/entitlements', token_bearer=self._account.jwt_token)
+        reply = util.http_get(SOLOCOO_API + '/entitlements', token_bearer=self._account.jwt_token, auth=self)
 
-        entitlements = json.loads(reply.text)
+        entitlements = json.loads(reply.content)
 
         return dict(
             products=[product.get('id') for product in entitlements.get('products')],
@@ -392,9 +519,9 @@ class AuthApi:
 
         :rtype: list[dict]
         """
-        reply = util.http_get(SOLOCOO_API + '/devices', token_bearer=self._account.jwt_token)
+        reply = util.http_get(SOLOCOO_API + '/devices', token_bearer=self._account.jwt_token, auth=self)
 
-        devices = json.loads(reply.text)
+        devices = json.loads(reply.content)
         return devices
 
     def remove_device(self, uid):
@@ -402,23 +529,105 @@ class AuthApi:
 
         :param str uid:                 The ID of the device to remove.
         """
-        util.http_post(SOLOCOO_API + '/devices', token_bearer=self._account.jwt_token,
+        util.http_post(SOLOCOO_API + '/devices', token_bearer=self._account.jwt_token, auth=self,
                        data={
                            'delete': [uid]
                        })
 
-    def _load_cache(self):
-        """ Load tokens from cache """
+    def _load_entitlements(self):
+        """ Load the entitlements from cache when they still belong to our current session.
+
+        :rtype: dict|None
+        """
+        try:
+            with open(os.path.join(self._token_path, self.ENTITLEMENTS_FILE), 'r') as fdesc:
+                data = json.loads(fdesc.read())
+        except (IOError, TypeError, ValueError):
+            return None
+
+        if data.get('token') != self._get_token_hash() or data.get('expires', 0) < time.time():
+            _LOGGER.debug('Cached entitlements are not valid anymore.')
+            return None
+
+        return data.get('entitlements')
+
+    def _save_entitlements(self, entitlements):
+        """ Store the entitlements in cache, tied to our current session.
+
+        :param dict entitlements:       The entitlements to store.
+        """
+        if not os.path.exists(self._token_path):
+            os.makedirs(self._token_path)
+
+        atomic_write(os.path.join(self._token_path, self.ENTITLEMENTS_FILE), json.dumps(dict(
+            token=self._get_token_hash(),
+            expires=self._account.get_token_expiry(),
+            entitlements=entitlements,
+        ), indent=2))
+
+    def _clear_entitlements(self):
+        """ Remove the cached entitlements. """
+        self._entitlements = None
+        self._offers = None
+        try:
+            os.remove(os.path.join(self._token_path, self.ENTITLEMENTS_FILE))
+        except OSError:
+            pass
+
+    def _get_token_hash(self):
+        """ Return a hash of our session, so we can detect that our cached data belongs to another session.
+
+        :rtype: str
+        """
+        return md5(((self._account.hash or '') + ':' + (self._account.jwt_token or '')).encode('utf-8')).hexdigest()
+
+    def _use_renewed_tokens(self, jwt_token):
+        """ Use the tokens from the cache when another process has renewed them in the meantime.
+
+        :param str jwt_token:           The JWT we had before we started to wait for the lock.
+
+        :returns:                       True when we are now using the renewed tokens.
+        :rtype: bool
+        """
+        data = self._read_cache()
+        if not data or data.get('hash') != self._account.hash or data.get('jwt_token') in (None, '', jwt_token):
+            return False
+
+        account = AccountStorage()
+        account.__dict__ = data  # pylint: disable=attribute-defined-outside-init
+        if not account.is_valid_token(self.RENEW_MARGIN):
+            return False
+
+        self._account.__dict__ = data  # pylint: disable=attribute-defined-outside-init
+
+        # The entitlements we keep in memory belong to the previous session
+        self._entitlements = None
+        self._offers = None
+        return True
+
+    def _read_cache(self):
+        """ Read the tokens from the cache.
+
+        :rtype: dict|None
+        """
         try:
             with open(os.path.join(self._token_path, self.TOKEN_FILE), 'r') as fdesc:
-                self._account.__dict__ = json.loads(fdesc.read())  # pylint: disable=attribute-defined-outside-init
+                return json.loads(fdesc.read())
         except (IOError, TypeError, ValueError):
+            return None
+
+    def _load_cache(self):
+        """ Load tokens from cache """
+        data = self._read_cache()
+        if data is None:
             _LOGGER.warning('We could not use the cache since it is invalid or non-existent.')
+            return
+        self._account.__dict__ = data  # pylint: disable=attribute-defined-outside-init
 
     def _save_cache(self):
         """ Store tokens in cache """
         if not os.path.exists(self._token_path):
             os.makedirs(self._token_path)
 
-        with open(os.path.join(self._token_path, self.TOKEN_FILE), 'w') as fdesc:
-            json.dump(self._account.__dict__, fdesc, indent=2)
+        # Another process should never read a half-written file
+        atomic_write(os.path.join(self._token_path, self.TOKEN_FILE), json.dumps(self._account.__dict__, indent=2))
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+""" Solocoo Cache """
+
+from __future__ import absolute_import, division, unicode_literals
+
+import errno
+import json
+import logging
+import os
+import time
+from hashlib import md5
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def atomic_write(filename, data):
+    """ Write data to a file by writing to a temporary file first, and renaming it afterwards.
+
+    This makes sure that another process never reads a half-written file.
+
+    :param str filename:                The file to write to.
+    :param str|iter data:               The data to write, or an iterable of chunks to write one by one.
+    """
+    if isinstance(data, (str, bytes)) or not hasattr(data, '__iter__'):
+        data = [data]
+
+    tmp_filename = '%s.%s.tmp' % (filename, os.getpid())
+    try:
+        with open(tmp_filename, 'wb') as fdesc:
+            for chunk in data:
+                fdesc.write(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+    except Exception:
+        # Don't leave half-written files behind
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+        raise
+
+    try:  # Python 3
+        os.replace(tmp_filename, filename)
+    except AttributeError:  # Python 2
+        if os.path.exists(filename):
+            os.remove(filename)
+        os.rename(tmp_filename, filename)
+
+
+class FileLock:
+    """ A lock that is shared between processes, by creating a lock file. """
+
+    def __init__(self, filename, timeout=30, stale_after=60):
+        """ Initialisation of the class.
+
+        :param str filename:            The filename of the lock file.
+        :param int timeout:             The number of seconds to wait for the lock before we continue without it.
+        :param int stale_after:         The number of seconds after which we consider a lock to be left behind by a crashed process.
+        """
+        self._filename = filename
+        self._timeout = timeout
+        self._stale_after = stale_after
+        self._locked = False
+
+    def acquire(self):
+        """ Wait until we have the lock.
+
+        :returns:                       True when we have the lock, False when we gave up waiting for it.
+        :rtype: bool
+        """
+        path = os.path.dirname(self._filename)
+        if path and not os.path.exists(path):
+            os.makedirs(path)
+
+        deadline = time.time() + self._timeout
+        while True:
+            try:
+                os.close(os.open(self._filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                self._locked = True
+                return True
+            except OSError as exc:
+                if exc.errno != errno.EEXIST:
+                    raise
+
+            try:
+                if os.path.getmtime(self._filename) + self._stale_after < time.time():
+                    _LOGGER.warning('Removing stale lock %s', self._filename)
+                    os.remove(self._filename)
+                    continue
+            except OSError:
+                # The lock was released in the meantime
+                continue
+
+            if time.time() > deadline:
+                _LOGGER.warning('Timeout while waiting for lock %s', self._filename)
+                return False
+
+            time.sleep(.1)
+
+    def release(self):
+        """ Release the lock. """
+        if not self._locked:
+            return
+        self._locked = False
+        try:
+            os.remove(self._filename)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+class FileCache:
+    """ A persistent cache that keeps JSON documents on disk with a size-bounded LRU eviction. """
+
+    def __init__(self, path, max_size=10 * 1024 * 1024):
+        """ Initialisation of the class.
+
+        :param str path:                The folder where we can store our cache files.
+        :param int max_size:            The maximum size in bytes of all cache files together.
+        """
+        self._path = path
+        self._max_size = max_size
+
+    @staticmethod
+    def make_key(*args):
+        """ Create a cache key based on the passed arguments.
+
+        :returns:                       A key that can be used as filename.
+        :rtype: str
+        """
+        return md5(json.dumps(args, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """ Get an entry from the cache. Expired entries are also returned, so they can be revalidated.
+
+        :param str key:                 The key of the entry.
+
+        :returns:                       The stored entry with the keys `data` and `expires`, or None.
+        :rtype: dict
+        """
+        filename = os.path.join(self._path, key + '.json')
+        try:
+            with open(filename, 'r') as fdesc:
+                entry = json.load(fdesc)
+        except (IOError, OSError, ValueError):
+            return None
+
+        # Mark this entry as recently used
+        try:
+            os.utime(filename, None)
+        except OSError:
+            pass
+
+        return entry
+
+    def set(self, key, data, ttl=None):
+        """ Store an entry in the cache.
+
+        :param str key:                 The key of the entry.
+        :param any data:                The data to store. This needs to be JSON serializable.
+        :param int ttl:                 The number of seconds this entry is valid. None means it doesn't expire.
+        """
+        if not os.path.exists(self._path):
+            os.makedirs(self._path)
+
+        entry = dict(
+            data=data,
+            expires=time.time() + ttl if ttl is not None else None,
+        )
+
+        try:
+            atomic_write(os.path.join(self._path, key + '.json'), json.dumps(entry))
+        except (IOError, OSError) as exc:
+            _LOGGER.warning('Could not write to the cache: %s', exc)
+            return
+
+        self._evict()
+
+    def touch(self, key, ttl=None):
+        """ Extend the lifetime of an entry.
+
+        :param str key:                 The key of the entry.
+        :param int ttl:                 The number of seconds this entry is valid from now.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            self.set(key, entry.get('data'), ttl)
+
+    def delete(self, key):
+        """ Remove an entry from the cache.
+
+        :param str key:                 The key of the entry.
+        """
+        try:
+            os.remove(os.path.join(self._path, key + '.json'))
+        except OSError:
+            pass
+
+    @staticmethod
+    def is_fresh(entry):
+        """ Check if an entry is still valid.
+
+        :param dict entry:              The entry as returned by get().
+
+        :rtype: bool
+        """
+        return entry.get('expires') is None or entry.get('expires') > time.time()
+
+    def _evict(self):
+        """ Remove the least recently used entries until we are below our maximum size. """
+        try:
+            files = []
+            for filename in os.listdir(self._path):
+                if not filename.endswith('.json'):
+                    continue
+                stat = os.stat(os.path.join(self._path, filename))
+                files.append((stat.st_mtime, stat.st_size, filename))
+        except OSError:
+            return
+
+        total_size = sum(size for _, size, _ in files)
+        if total_size <= self._max_size:
+            return
+
+        # Remove the oldest entries first
+        for _, size, filename in sorted(files):
+            _LOGGER.debug('Evicting %s from the cache', filename)
+            try:
+                os.remove(os.path.join(self._path, filename))
+            except OSError:
+                continue
+            total_size -= size
+            if total_size <= self._max_size:
+                break
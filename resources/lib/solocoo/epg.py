@@ -5,17 +5,105 @@ from __future__ import absolute_import, division, unicode_literals
 
 import json
 import logging
+import time
+from bisect import bisect_left, bisect_right
+from calendar import timegm
 from datetime import datetime, timedelta
 
 import dateutil.parser
 import dateutil.tz
 
 from resources.lib.solocoo import SOLOCOO_API, util
+from resources.lib.solocoo.store import EpgStore
 from resources.lib.solocoo.util import parse_epg, parse_epg_capi
 
+try:  # Python 3
+    from collections.abc import Sequence
+except ImportError:  # Python 2
+    from collections import Sequence  # pylint: disable=deprecated-class
+
 _LOGGER = logging.getLogger(__name__)
 
 
+class LazyPrograms(Sequence):
+    """ The programs of a channel, that are only parsed when they are accessed.
+
+    The programs are sorted by their start time, and they don't overlap, so both the start times and the end times are
+    sorted. This allows us to look up the programs around a time with a binary search, without parsing the others.
+    """
+
+    def __init__(self, programs, times, parse):
+        """ Initialisation of the class.
+
+        :param list[dict] programs:     The programs as they were returned by the API, sorted by start time.
+        :param list[tuple] times:       The (start, end) of every program as unix timestamps.
+        :param callable parse:          The function that parses a program.
+        """
+        self._programs = programs
+        self._starts = [start for start, _ in times]
+        self._ends = [end for _, end in times]
+        self._parse = parse
+        self._parsed = {}
+
+    def __len__(self):
+        return len(self._programs)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[idx] for idx in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if index not in self._parsed:
+            self._parsed[index] = self._parse(self._programs[index])
+        return self._parsed[index]
+
+    @classmethod
+    def from_programs(cls, programs):
+        """ Create an index of programs that are already parsed.
+
+        :param list[resources.lib.solocoo.Epg] programs: The programs.
+
+        :rtype: LazyPrograms
+        """
+        programs = sorted(programs, key=lambda program: program.start)
+        return cls(programs, [(timegm(program.start.utctimetuple()), timegm(program.end.utctimetuple())) for program in programs],
+                   lambda program: program)
+
+    def get_at(self, timestamp):
+        """ Return the program that is airing at the specified time.
+
+        :param int timestamp:           The time as a unix timestamp.
+
+        :rtype: resources.lib.solocoo.Epg|None
+        """
+        index = bisect_right(self._ends, timestamp)
+        if index < len(self) and self._starts[index] <= timestamp:
+            return self[index]
+        return None
+
+    def get_range(self, start, end):
+        """ Return the programs that are airing between the specified times.
+
+        :param int start:               The start of the range as a unix timestamp.
+        :param int end:                 The end of the range as a unix timestamp.
+
+        :rtype: list[resources.lib.solocoo.Epg]
+        """
+        return self[bisect_right(self._ends, start):bisect_left(self._starts, end)]
+
+    def get_upcoming(self, timestamp, count=2):
+        """ Return the programs that haven't ended yet at the specified time, starting with the one that is airing.
+
+        :param int timestamp:           The time as a unix timestamp.
+        :param int count:               The maximum number of programs to return.
+
+        :rtype: list[resources.lib.solocoo.Epg]
+        """
+        index = bisect_right(self._ends, timestamp)
+        return self[index:index + count]
+
+
 class EpgApi:
     """ Solocoo EPG API """
 
@@ -23,128 +111,398 @@ class EpgApi:
     EPG_CHUNK_SIZE = 40
     EPG_CAPI_CHUNK_SIZE = 100
 
+    # Request this many chunks in parallel
+    EPG_WORKERS = 4
+
     EPG_NO_BROADCAST = 'Geen uitzending'
 
-    def __init__(self, auth):
+    # Fetch this many hours of the schedule when the bouquet has no now and next for a channel
+    NOW_NEXT_WINDOW = 6
+
+    def __init__(self, auth, workers=None, store=None, cache=None):
         """ Initialisation of the class.
 
         :param resources.lib.solocoo.auth.AuthApi auth: The Authentication object
+        :param int workers:                             The number of chunks to request in parallel.
+        :param EpgStore store:                          An optional store to keep the EPG locally.
+        :param resources.lib.solocoo.cache.FileCache cache: An optional cache for the now and next of the channels.
         """
         self._auth = auth
         self._tokens = self._auth.get_tokens()
         self._tenant = self._auth.get_tenant()
+        self._workers = workers or self.EPG_WORKERS
+        self._store = store
+        self._cache = cache
 
-    def get_guide(self, channels, date_from=None, date_to=None):
+    def get_guide(self, channels, date_from=None, date_to=None, lazy=False):
         """ Get the guide for the specified channels and date.
 
         :param list|str channels:       A single channel or a list of channels to fetch.
         :param str|datetime date_from:  The date of the guide we want to fetch.
         :param str|datetime date_to:    The date of the guide we want to fetch.
+        :param bool lazy:               Only parse the programs when they are accessed.
 
         :returns:                       A parsed dict with EPG data.
-        :rtype: dict[str, list[resources.lib.solocoo.Epg]]
+        :rtype: dict[str, list[resources.lib.solocoo.Epg]|LazyPrograms]
         """
         # Allow to specify one channel, and we map it to a list
         if not isinstance(channels, list):
             channels = [channels]
 
-        entitlements = self._auth.list_entitlements()
-        offers = entitlements.get('offers', [])
+        offers = util.EntitlementChecker(self._auth.get_offers())
 
         # Generate dates in UTC format
-        if date_from is not None:
-            date_from = self._parse_date(date_from)
-        else:
-            date_from = self._parse_date('today')
+        date_from, date_to = self._parse_window(date_from, date_to)
 
-        if date_to is not None:
-            date_to = self._parse_date(date_to)
-        else:
-            date_to = date_from + timedelta(days=1)
+        return dict(self._iter_guide(EpgStore.SOURCE_TVAPI, self._fetch_guide, self.EPG_CHUNK_SIZE, channels, date_from, date_to,
+                                     lambda program: parse_epg(program, offers), lazy))
 
-        programs = {}
-
-        for i in range(0, len(channels), self.EPG_CHUNK_SIZE):
-            _LOGGER.debug('Fetching EPG at index %d', i)
+    def get_guide_with_capi(self, channels, date_from=None, date_to=None, lazy=False):
+        """ Get the guide for the specified channels and date. Lookup by stationid.
 
-            reply = util.http_get(SOLOCOO_API + '/schedule',
-                                  params={
-                                      'channels': ','.join(channels[i:i + self.EPG_CHUNK_SIZE]),
-                                      'from': date_from.isoformat().replace('+00:00', ''),
-                                      'until': date_to.isoformat().replace('+00:00', ''),
-                                      'maxProgramsPerChannel': 2147483647,  # The android app also does this
-                                  },
-                                  token_bearer=self._tokens.jwt_token)
-            data = json.loads(reply.text)
+        :param list|str channels:       A single channel or a list of channels to fetch.
+        :param str|datetime date_from:  The date of the guide we want to fetch.
+        :param str|datetime date_to:    The date of the guide we want to fetch.
+        :param bool lazy:               Only parse the programs when they are accessed.
 
-            # Parse to a dict (channel: list[Epg])
-            programs.update({channel: [parse_epg(program, offers) for program in programs]
-                             for channel, programs in data.get('epg', []).items()})
+        :returns:                       A parsed dict with EPG data.
+        :rtype: dict[str, list[resources.lib.solocoo.Epg]|LazyPrograms]
+        """
+        return dict(self.iter_guide_with_capi(channels, date_from, date_to, lazy))
 
-        return programs
+    def iter_guide_with_capi(self, channels, date_from=None, date_to=None, lazy=False):
+        """ Get the guide for the specified channels and date, one channel at a time. Lookup by stationid.
 
-    def get_guide_with_capi(self, channels, date_from=None, date_to=None):
-        """ Get the guide for the specified channels and date. Lookup by stationid.
+        When we have a store, only the programs of one channel are kept in memory at the same time.
 
         :param list|str channels:       A single channel or a list of channels to fetch.
         :param str|datetime date_from:  The date of the guide we want to fetch.
         :param str|datetime date_to:    The date of the guide we want to fetch.
+        :param bool lazy:               Only parse the programs when they are accessed.
 
-        :returns:                       A parsed dict with EPG data.
-        :rtype: dict[str, list[resources.lib.solocoo.Epg]]
+        :returns:                       A generator of (channel, programs) tuples.
+        :rtype: collections.Iterable[tuple[str, list[resources.lib.solocoo.Epg]|LazyPrograms]]
         """
         # Allow to specify one channel, and we map it to a list
         if not isinstance(channels, list):
             channels = [channels]
 
+        # Generate dates in UTC format
+        date_from, date_to = self._parse_window(date_from, date_to)
+
+        return self._iter_guide(EpgStore.SOURCE_CAPI, self._fetch_guide_with_capi, self.EPG_CAPI_CHUNK_SIZE, channels, date_from, date_to,
+                                lambda program: parse_epg_capi(program, self._tenant), lazy)
+
+    def prefetch_guide_with_capi(self, channels, date_from=None, date_to=None):
+        """ Make sure that the store has the guide for the specified channels and date, without reading it back. Lookup by
+        stationid. This does nothing when we don't have a store.
+
+        An error is raised when we couldn't fetch any of the channels.
+
+        :param list[str] channels:      The channels to fetch.
+        :param str|datetime date_from:  The date of the guide we want to fetch.
+        :param str|datetime date_to:    The date of the guide we want to fetch.
+        """
+        if self._store is None:
+            return
+
+        date_from, date_to = self._parse_window(date_from, date_to)
+        self._fill_store(EpgStore.SOURCE_CAPI, self._fetch_guide_with_capi, self.EPG_CAPI_CHUNK_SIZE, channels, date_from, date_to)
+
+    def _iter_guide(self, source, fetch, chunk_size, channels, date_from, date_to, parse, lazy=False):
+        """ Get the guide from the API, or from the store when we have one.
+
+        :param str source:              The source of the EPG.
+        :param callable fetch:          The function that fetches the EPG of a chunk of channels.
+        :param int chunk_size:          The number of channels to fetch at the same time.
+        :param list[str] channels:      The channels to fetch.
+        :param datetime date_from:      The start of the guide.
+        :param datetime date_to:        The end of the guide.
+        :param callable parse:          The function that parses a program.
+        :param bool lazy:               Only parse the programs when they are accessed.
+
+        :returns:                       A generator of (channel, programs) tuples.
+        :rtype: collections.Iterable[tuple[str, list[resources.lib.solocoo.Epg]|LazyPrograms]]
+        """
+        def parse_programs(rows):
+            """ Parse the (start, end, program) rows of a channel, or wrap them so they are parsed on access. """
+            if not lazy:
+                return [parse(program) for _, _, program in rows]
+            return LazyPrograms([program for _, _, program in rows], [(start, end) for start, end, _ in rows], parse)
+
+        if self._store is None:
+            for _, reply in self._fetch_chunks(fetch, [(channels, date_from, date_to)], chunk_size):
+                for channel, programs in reply.items():
+                    if not lazy:
+                        yield channel, [parse(program) for program in programs]
+                        continue
+                    yield channel, self._to_lazy_programs(source, programs, parse)
+            return
+
+        self._fill_store(source, fetch, chunk_size, channels, date_from, date_to)
+
+        # Serve the guide from the store
+        start, end = self._to_timestamp(date_from), self._to_timestamp(date_to)
+        for channel in channels:
+            yield channel, parse_programs(self._store.get_programs(source, channel, start, end))
+
+    def _fill_store(self, source, fetch, chunk_size, channels, date_from, date_to):
+        """ Fetch the days of the guide that we don't have yet, or that are too old, into the store.
+
+        Every chunk is written to the store as soon as it has been fetched, so we never keep the replies of all chunks in memory.
+
+        :param str source:              The source of the EPG.
+        :param callable fetch:          The function that fetches the EPG of a chunk of channels.
+        :param int chunk_size:          The number of channels to fetch at the same time.
+        :param list[str] channels:      The channels to fetch.
+        :param datetime date_from:      The start of the guide.
+        :param datetime date_to:        The end of the guide.
+        """
+        windows = []
+        for day_from, day_to in self._get_days(date_from, date_to):
+            stale = self._store.get_stale_channels(source, channels, self._to_timestamp(day_from))
+            if stale:
+                windows.append((stale, day_from, day_to))
+
+        def fetch_and_store(chunk, day_from, day_to):
+            """ Fetch the EPG of a chunk of channels for one day, and write it to the store. """
+            reply = fetch(chunk, day_from, day_to)
+            rows = []
+            for channel, programs in reply.items():
+                for program in programs:
+                    start, end = self._get_program_times(source, program)
+                    rows.append((channel, start, end, program))
+            self._store.update(source, self._to_timestamp(day_from), chunk, rows)
+
+        self._fetch_chunks(fetch_and_store, windows, chunk_size)
+
+    def update_now_next(self, channels):
+        """ Make sure the epg_now and epg_next of the channels are up to date.
+
+        The bouquet already contains the program that is airing now and the next one. We only fetch a small part of the
+        schedule for the channels where this information is missing or has ended, and we cache this until the first of
+        these programs ends.
+
+        :param list[resources.lib.solocoo.Channel] channels: The channels to update.
+        """
+        now = int(time.time())
+
+        missing = [channel for channel in channels if not self._is_airing(channel.epg_now, now)]
+        if not missing:
+            return
+
+        offers = util.EntitlementChecker(self._auth.get_offers())
+
+        def get_upcoming(programs):
+            """ Return the program that is airing now and the next one. """
+            return self._to_lazy_programs(EpgStore.SOURCE_TVAPI, programs, lambda program: parse_epg(program, offers)).get_upcoming(now)
+
+        # Use the programs we have fetched before if they haven't ended yet
+        cache_key = self._cache.make_key('now_next', self._auth.get_cache_scope()) if self._cache else None
+        entry = self._cache.get(cache_key) if self._cache else None
+        cached = entry.get('data') if entry and self._cache.is_fresh(entry) else {}
+
+        fetch = [channel for channel in missing if not get_upcoming(cached.get(channel.uid, []))]
+        if fetch:
+            _LOGGER.debug('Fetching now and next for %d channels', len(fetch))
+            date_from = datetime.fromtimestamp(now, dateutil.tz.UTC)
+            date_to = date_from + timedelta(hours=self.NOW_NEXT_WINDOW)
+            for _, reply in self._fetch_chunks(lambda chunk, start, end: self._fetch_guide(chunk, start, end, max_programs=2),
+                                               [([channel.uid for channel in fetch], date_from, date_to)], self.EPG_CHUNK_SIZE):
+                cached.update(reply)
+
+        for channel in missing:
+            upcoming = get_upcoming(cached.get(channel.uid, []))
+            channel.epg_now = upcoming[0] if upcoming else None
+            channel.epg_next = upcoming[1] if len(upcoming) > 1 else None
+
+        if not fetch or self._cache is None:
+            return
+
+        # Keep the schedule until the first program ends, at that time we need to fetch a new one
+        ends = [self._to_timestamp(channel.epg_now.end) for channel in missing if channel.epg_now and channel.epg_now.end]
+        ends = [end for end in ends if end > now]
+        if ends:
+            self._cache.set(cache_key, cached, min(ends) - now)
+
+    @classmethod
+    def _is_airing(cls, program, now):
+        """ Check if a program is airing at the specified time.
+
+        :param resources.lib.solocoo.Epg program: The program to check.
+        :param int now:                 The time as a unix timestamp.
+
+        :rtype: bool
+        """
+        if program is None or program.start is None or program.end is None:
+            return False
+        return cls._to_timestamp(program.start) <= now < cls._to_timestamp(program.end)
+
+    def _fetch_guide(self, channels, date_from, date_to, max_programs=2147483647):
+        """ Fetch the EPG of a chunk of channels from the TV API.
+
+        :param list[str] channels:      The channels to fetch.
+        :param datetime date_from:      The start of the guide.
+        :param datetime date_to:        The end of the guide.
+        :param int max_programs:        The maximum number of programs to fetch per channel.
+
+        :returns:                       A dict with the programs of every channel, as they are returned by the API.
+        :rtype: dict[str, list[dict]]
+        """
+        reply = util.http_get(SOLOCOO_API + '/schedule',
+                              params={
+                                  'channels': ','.join(channels),
+                                  'from': date_from.isoformat().replace('+00:00', ''),
+                                  'until': date_to.isoformat().replace('+00:00', ''),
+                                  'maxProgramsPerChannel': max_programs,  # The android app uses 2147483647
+                              },
+                              token_bearer=self._tokens.jwt_token, auth=self._auth)
+        data = json.loads(reply.content)
+
+        return data.get('epg', {})
+
+    def _fetch_guide_with_capi(self, channels, date_from, date_to):
+        """ Fetch the EPG of a chunk of channels from the CAPI.
+
+        :param list[str] channels:      The station ids of the channels to fetch.
+        :param datetime date_from:      The start of the guide.
+        :param datetime date_to:        The end of the guide.
+
+        :returns:                       A dict with the programs of every channel, as they are returned by the API.
+        :rtype: dict[str, list[dict]]
+        """
+        reply = util.http_get(
+            'https://{domain}/{env}/capi.aspx'.format(domain=self._tenant.get('domain'), env=self._tenant.get('env')),
+            params={
+                'z': 'epg',
+                'f_format': 'pg',  # program guide
+                'v': 3,  # version
+                'u': self._tokens.device_serial,
+                'a': self._tenant.get('app'),
+                's': '!'.join(channels),  # station id's separated with a !
+                'f': str(self._to_timestamp(date_from)) + '000',  # from timestamp
+                't': str(self._to_timestamp(date_to)) + '000',  # to timestamp
+                # 736763 = BIT_EPG_DETAIL_ID | BIT_EPG_DETAIL_TITLE | BIT_EPG_DETAIL_DESCRIPTION | BIT_EPG_DETAIL_AGE |
+                #          BIT_EPG_DETAIL_CATEGORY | BIT_EPG_DETAIL_START | BIT_EPG_DETAIL_END | BIT_EPG_DETAIL_FLAGS |
+                #          BIT_EPG_DETAIL_COVER | BIT_EPG_DETAIL_SEASON_NO | BIT_EPG_DETAIL_EPISODE_NO |
+                #          BIT_EPG_DETAIL_SERIES_ID | BIT_EPG_DETAIL_GENRES | BIT_EPG_DETAIL_CREDITS | BIT_EPG_DETAIL_FORMATS
+                'cs': 736763,
+                'lng': 'nl_BE',
+            },
+            token_cookie=self._tokens.aspx_token, auth=self._auth)
+        data = json.loads(reply.content)
+
+        return data[1]
+
+    def _fetch_chunks(self, func, windows, chunk_size):
+        """ Fetch the EPG in chunks of channels. The chunks are requested in parallel.
+
+        A chunk that fails is skipped, so we can still return the EPG of the other chunks.
+
+        :param callable func:           The function that fetches the EPG of a chunk.
+        :param list[tuple] windows:     A list of (channels, date_from, date_to) tuples to fetch.
+        :param int chunk_size:          The number of channels in one chunk.
+
+        :returns:                       A list of ((channels, date_from, date_to), result) tuples of the chunks that succeeded, in
+                                        order, with the result of func.
+        :rtype: list[tuple]
+        """
+        chunks = [(channels[i:i + chunk_size], date_from, date_to)
+                  for channels, date_from, date_to in windows
+                  for i in range(0, len(channels), chunk_size)]
+        _LOGGER.debug('Fetching EPG in %d chunks', len(chunks))
+
+        results = util.run_parallel(lambda chunk: func(*chunk), chunks, self._workers)
+
+        replies = []
+        errors = []
+        for chunk, (reply, exc) in zip(chunks, results):
+            if exc is not None:
+                _LOGGER.warning('Could not fetch the EPG of channels %s: %s', ','.join(chunk[0]), exc)
+                errors.append(exc)
+                continue
+            replies.append((chunk, reply))
+
+        # Only fail when we have nothing to show
+        if errors and not replies:
+            raise errors[0]
+
+        return replies
+
+    def _to_lazy_programs(self, source, programs, parse):
+        """ Sort the programs of a channel as they were returned by the API, and wrap them so they are parsed on access.
+
+        :param str source:              The source of the EPG.
+        :param list[dict] programs:     The programs as they were returned by the API.
+        :param callable parse:          The function that parses a program.
+
+        :rtype: LazyPrograms
+        """
+        rows = sorted((self._get_program_times(source, program) + (program,) for program in programs), key=lambda row: row[0])
+        return LazyPrograms([program for _, _, program in rows], [(start, end) for start, end, _ in rows], parse)
+
+    @staticmethod
+    def _get_program_times(source, program):
+        """ Return the start and end time of a program as it was returned by the API.
+
+        :param str source:              The source of the EPG.
+        :param dict program:            The program as it was returned by the API.
+
+        :returns:                       A tuple with the start and the end as unix timestamp.
+        :rtype: tuple[int, int]
+        """
+        if source == EpgStore.SOURCE_CAPI:
+            return program.get('start') // 1000, program.get('end') // 1000
+
+        return (util.parse_iso8601_timestamp(program.get('params', {}).get('start')),
+                util.parse_iso8601_timestamp(program.get('params', {}).get('end')))
+
+    @staticmethod
+    def _get_days(date_from, date_to):
+        """ Return the days that cover the specified window.
+
+        :param datetime date_from:      The start of the window.
+        :param datetime date_to:        The end of the window.
+
+        :returns:                       A list of (day_from, day_to) tuples in UTC, starting at midnight in the local timezone.
+        :rtype: list[tuple[datetime, datetime]]
+        """
+        days = []
+        day = date_from.astimezone(dateutil.tz.tzlocal()).date()
+        while True:
+            day_from = datetime(day.year, day.month, day.day, tzinfo=dateutil.tz.tzlocal()).astimezone(dateutil.tz.UTC)
+            if day_from >= date_to:
+                break
+            day += timedelta(days=1)
+            day_to = datetime(day.year, day.month, day.day, tzinfo=dateutil.tz.tzlocal()).astimezone(dateutil.tz.UTC)
+            days.append((day_from, day_to))
+        return days
+
+    @staticmethod
+    def _to_timestamp(date):
+        """ Convert a datetime to a unix timestamp.
+
+        :param datetime date:           The date to convert.
+
+        :returns:                       The unix timestamp.
+        :rtype: int
+        """
         # Python 2.7 doesn't support .timestamp(), and windows doesn't do '%s', so we need to calculate it ourself
-        epoch = datetime(1970, 1, 1, tzinfo=dateutil.tz.UTC)
+        return timegm(date.utctimetuple())
 
-        # Generate dates in UTC format
-        if date_from is not None:
-            date_from = self._parse_date(date_from)
-        else:
-            date_from = self._parse_date('today')
-        date_from_posix = str(int((date_from - epoch).total_seconds())) + '000'
+    @classmethod
+    def _parse_window(cls, date_from, date_to):
+        """ Parse the start and the end of a guide. We start today, and we end one day after the start by default.
 
-        if date_to is not None:
-            date_to = self._parse_date(date_to)
-        else:
-            date_to = date_from + timedelta(days=1)
-        date_to_posix = str(int((date_to - epoch).total_seconds())) + '000'
-
-        programs = {}
-
-        for i in range(0, len(channels), self.EPG_CAPI_CHUNK_SIZE):
-            _LOGGER.debug('Fetching EPG at index %d', i)
-
-            reply = util.http_get(
-                'https://{domain}/{env}/capi.aspx'.format(domain=self._tenant.get('domain'), env=self._tenant.get('env')),
-                params={
-                    'z': 'epg',
-                    'f_format': 'pg',  # program guide
-                    'v': 3,  # version
-                    'u': self._tokens.device_serial,
-                    'a': self._tenant.get('app'),
-                    's': '!'.join(channels[i:i + self.EPG_CAPI_CHUNK_SIZE]),  # station id's separated with a !
-                    'f': date_from_posix,  # from timestamp
-                    't': date_to_posix,  # to timestamp
-                    # 736763 = BIT_EPG_DETAIL_ID | BIT_EPG_DETAIL_TITLE | BIT_EPG_DETAIL_DESCRIPTION | BIT_EPG_DETAIL_AGE |
-                    #          BIT_EPG_DETAIL_CATEGORY | BIT_EPG_DETAIL_START | BIT_EPG_DETAIL_END | BIT_EPG_DETAIL_FLAGS |
-                    #          BIT_EPG_DETAIL_COVER | BIT_EPG_DETAIL_SEASON_NO | BIT_EPG_DETAIL_EPISODE_NO |
-                    #          BIT_EPG_DETAIL_SERIES_ID | BIT_EPG_DETAIL_GENRES | BIT_EPG_DETAIL_CREDITS | BIT_EPG_DETAIL_FORMATS
-                    'cs': 736763,
-                    'lng': 'nl_BE',
-                },
-                token_cookie=self._tokens.aspx_token)
-
-            data = json.loads(reply.text)
-
-            # Parse to a dict (channel: list[Epg])
-            programs.update({channel: [parse_epg_capi(program, self._tenant) for program in programs]
-                             for channel, programs in data[1].items()})
-
-        return programs
+        :param str|datetime date_from:  The start of the guide.
+        :param str|datetime date_to:    The end of the guide.
+
+        :returns:                       A tuple with the start and the end in UTC.
+        :rtype: tuple[datetime, datetime]
+        """
+        date_from = cls._parse_date(date_from if date_from is not None else 'today')
+        date_to = cls._parse_date(date_to) if date_to is not None else date_from + timedelta(days=1)
+        return date_from, date_to
 
     @staticmethod
     def _parse_date(date):
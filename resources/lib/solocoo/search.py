@@ -34,13 +34,12 @@ class SearchApi:
         if not query:
             return []
 
-        _LOGGER.debug('Requesting entitlements')
-        entitlements = self._auth.list_entitlements()
-        offers = entitlements.get('offers', [])
+        _LOGGER.debug('Requesting offers')
+        offers = util.EntitlementChecker(self._auth.get_offers())
 
         _LOGGER.debug('Requesting search listing')
-        reply = util.http_get(SOLOCOO_API + '/search', params=dict(query=query), token_bearer=self._tokens.jwt_token)
-        data = json.loads(reply.text)
+        reply = util.http_get(SOLOCOO_API + '/search', params=dict(query=query), token_bearer=self._tokens.jwt_token, auth=self._auth)
+        data = json.loads(reply.content)
 
         results = []
 
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+""" Solocoo EPG Store """
+
+from __future__ import absolute_import, division, unicode_literals
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class EpgStore:
+    """ Local storage for the EPG, so we don't need to download the same days over and over again """
+
+    SOURCE_TVAPI = 'tvapi'
+    SOURCE_CAPI = 'capi'
+
+    # Increase this when the layout of the database changes
+    SCHEMA_VERSION = 1
+
+    # Keep programs for this many seconds after they have ended
+    RETENTION = 10 * 86400
+
+    def __init__(self, filename, max_age=4 * 3600):
+        """ Initialisation of the class.
+
+        :param str filename:            The filename of the database.
+        :param int max_age:             The number of seconds before a day of the EPG is fetched again.
+        """
+        self._max_age = max_age
+
+        path = os.path.dirname(filename)
+        if path and not os.path.exists(path):
+            os.makedirs(path)
+
+        # The connection is shared with the threads that fetch the EPG, so we need to serialize access ourselves
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(filename, timeout=10, check_same_thread=False)
+        self._create_schema()
+
+    def _create_schema(self):
+        """ Create the tables when they don't exist yet. """
+        with self._lock, self._conn:
+            version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+            if version != self.SCHEMA_VERSION:
+                _LOGGER.debug('Creating EPG store with schema version %d', self.SCHEMA_VERSION)
+                self._conn.execute('DROP TABLE IF EXISTS programs')
+                self._conn.execute('DROP TABLE IF EXISTS windows')
+                self._conn.execute('PRAGMA user_version = %d' % self.SCHEMA_VERSION)
+
+            self._conn.execute('CREATE TABLE IF NOT EXISTS programs ('
+                               'source TEXT NOT NULL, '
+                               'channel TEXT NOT NULL, '
+                               'start_time INTEGER NOT NULL, '
+                               'end_time INTEGER NOT NULL, '
+                               'day INTEGER NOT NULL, '
+                               'data TEXT NOT NULL, '
+                               'PRIMARY KEY (source, channel, start_time))')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS windows ('
+                               'source TEXT NOT NULL, '
+                               'channel TEXT NOT NULL, '
+                               'day INTEGER NOT NULL, '
+                               'fetched INTEGER NOT NULL, '
+                               'PRIMARY KEY (source, channel, day))')
+
+    def get_stale_channels(self, source, channels, day):
+        """ Return the channels that we need to fetch for the specified day.
+
+        :param str source:              The source of the EPG.
+        :param list[str] channels:      The channels we want to have.
+        :param int day:                 The start of the day as a unix timestamp.
+
+        :returns:                       The channels that we don't have, or that are too old.
+        :rtype: list[str]
+        """
+        with self._lock:
+            fresh = set(row[0] for row in self._conn.execute(
+                'SELECT channel FROM windows WHERE source = ? AND day = ? AND fetched >= ?',
+                (source, day, int(time.time()) - self._max_age)))
+
+        return [channel for channel in channels if channel not in fresh]
+
+    def update(self, source, day, channels, programs):
+        """ Replace the programs of the specified day.
+
+        :param str source:              The source of the EPG.
+        :param int day:                 The start of the day as a unix timestamp.
+        :param list[str] channels:      The channels that we have fetched.
+        :param list[tuple] programs:    A list of (channel, start, end, program) tuples, start and end as unix timestamps.
+        """
+        now = int(time.time())
+        with self._lock, self._conn:
+            self._conn.executemany('DELETE FROM programs WHERE source = ? AND channel = ? AND day = ?',
+                                   [(source, channel, day) for channel in channels])
+            self._conn.executemany('INSERT OR REPLACE INTO programs (source, channel, start_time, end_time, day, data) VALUES (?, ?, ?, ?, ?, ?)',
+                                   [(source, channel, start, end, day, json.dumps(program)) for channel, start, end, program in programs])
+            self._conn.executemany('INSERT OR REPLACE INTO windows (source, channel, day, fetched) VALUES (?, ?, ?, ?)',
+                                   [(source, channel, day, now) for channel in channels])
+
+            # Cleanup programs that are not available anymore
+            self._conn.execute('DELETE FROM programs WHERE end_time < ?', (now - self.RETENTION,))
+            self._conn.execute('DELETE FROM windows WHERE day < ?', (now - self.RETENTION,))
+
+    def get_programs(self, source, channel, start, end):
+        """ Return the programs that are airing on a channel between the specified times.
+
+        :param str source:              The source of the EPG.
+        :param str channel:             The channel.
+        :param int start:               The start of the window as a unix timestamp.
+        :param int end:                 The end of the window as a unix timestamp.
+
+        :returns:                       A list of (start, end, program) tuples sorted by start time, with the program as it
+                                        was returned by the API and start and end as unix timestamps.
+        :rtype: list[tuple[int, int, dict]]
+        """
+        with self._lock:
+            rows = self._conn.execute('SELECT start_time, end_time, data FROM programs WHERE source = ? AND channel = ? AND start_time < ? AND end_time > ? '
+                                      'ORDER BY start_time',
+                                      (source, channel, end, start)).fetchall()
+
+        return [(start_time, end_time, json.loads(data)) for start_time, end_time, data in rows]
+
+    def close(self):
+        """ Close the database. """
+        self._conn.close()
@@ -4,17 +4,28 @@
 from __future__ import absolute_import, division, unicode_literals
 
 import logging
+import os
+import threading
+import time
+from calendar import timegm
 from datetime import datetime
 
 import dateutil.parser
 import dateutil.tz
 import requests
 from requests import HTTPError
+from requests.structures import CaseInsensitiveDict
 
 from resources.lib import kodiutils
 from resources.lib.solocoo import Channel, Credit, Epg, EpgSeries, VodEpisode, VodGenre, VodMovie, VodSeries
+from resources.lib.solocoo.cache import FileCache
 from resources.lib.solocoo.exceptions import InvalidTokenException
 
+try:  # Python 3
+    from queue import Empty, Queue
+except ImportError:  # Python 2
+    from Queue import Empty, Queue
+
 _LOGGER = logging.getLogger(__name__)
 
 # Setup a static session that can be reused for all calls
@@ -23,7 +34,156 @@ SESSION.headers = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/71.0.3578.98 Safari/537.36',
 }
 
-PROXIES = kodiutils.get_proxies()
+# Give up on a request when the server doesn't respond within this many seconds
+REQUEST_TIMEOUT = 15
+
+# Ask Kodi for its proxy settings again after this many seconds, since they can be changed while our interpreter is reused
+PROXIES_TTL = 300
+
+# Maximum number of characters of a response body that we include in the debug log, or None to log the full body
+LOG_BODY_LIMIT = 2048
+
+# Maximum size of the HTTP response cache on disk
+HTTP_CACHE_SIZE = 20 * 1024 * 1024
+
+
+def run_parallel(func, items, workers=4):
+    """ Call a function for every item by using a bounded pool of threads.
+
+    An exception raised for one item doesn't affect the other items.
+
+    :param callable func:               The function to call with every item.
+    :param list items:                  The items to process.
+    :param int workers:                 The maximum number of threads to use.
+
+    :returns:                           A list of (result, exception) tuples in the same order as the items.
+    :rtype: list[tuple]
+    """
+    results = [(None, None)] * len(items)
+
+    queue = Queue()
+    for idx, item in enumerate(items):
+        queue.put((idx, item))
+
+    def worker():
+        """ Process items until the queue is empty. """
+        while True:
+            try:
+                idx, item = queue.get_nowait()
+            except Empty:
+                return
+            try:
+                results[idx] = (func(item), None)
+            except Exception as exc:  # pylint: disable=broad-except
+                results[idx] = (None, exc)
+
+    # Don't bother starting threads when there is only one thing to do
+    if workers <= 1 or len(items) <= 1:
+        worker()
+        return results
+
+    threads = [threading.Thread(target=worker) for _ in range(min(workers, len(items)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+def run_concurrently(calls):
+    """ Call some independent functions at the same time, and wait for all of them.
+
+    :param dict[str, callable] calls:   The functions to call, by name.
+
+    :returns:                           A tuple with a dict of the results and a dict of the durations in seconds, by name.
+    :rtype: tuple[dict, dict]
+    """
+    names = list(calls)
+
+    def timed(name):
+        """ Call a function and measure how long it took. """
+        start = time.time()
+        try:
+            return calls[name]()
+        finally:
+            timings[name] = time.time() - start
+
+    timings = {}
+    results = run_parallel(timed, names, workers=len(names))
+    _LOGGER.debug('Concurrent calls took %s', ', '.join('%s=%.3fs' % (name, timings[name]) for name in names))
+
+    # Raise the first error, since the caller can't continue without all results
+    for result, exc in results:
+        if exc is not None:
+            raise exc
+
+    return {name: result for name, (result, _) in zip(names, results)}, timings
+
+
+def get_local_timezone():
+    """ Return the local timezone. We keep the instance, since we need it for every date we parse.
+
+    :rtype: datetime.tzinfo
+    """
+    if not hasattr(get_local_timezone, 'cached'):
+        get_local_timezone.cached = dateutil.tz.tzlocal()
+    return getattr(get_local_timezone, 'cached')
+
+
+def _split_iso8601(value):
+    """ Split a date in the format that the TV API uses (2020-07-30T09:15:00Z) in its components.
+
+    :param str value:                   The date to split.
+
+    :returns:                           A tuple (year, month, day, hour, minute, second), or None if the format doesn't match.
+    :rtype: tuple[int]|None
+    """
+    # Check the separators at position 4, 7, 10, 13 and 16
+    if len(value) != 20 or value[4:17:3] != '--T::' or value[19] != 'Z':
+        return None
+    try:
+        return int(value[0:4]), int(value[5:7]), int(value[8:10]), int(value[11:13]), int(value[14:16]), int(value[17:19])
+    except ValueError:
+        return None
+
+
+def parse_iso8601(value):
+    """ Parse an ISO-8601 date from the TV API. Dates without a timezone are in UTC.
+
+    This is a lot faster than dateutil.parser for the fixed format that the API uses, but we fall back to dateutil for
+    anything else.
+
+    :param str value:                   The date to parse.
+
+    :returns:                           The date in UTC.
+    :rtype: datetime
+    """
+    parts = _split_iso8601(value)
+    if parts is not None:
+        try:
+            return datetime(*parts, tzinfo=dateutil.tz.UTC)
+        except ValueError:
+            pass
+
+    date = dateutil.parser.parse(value)
+    if date.tzinfo is None:
+        return date.replace(tzinfo=dateutil.tz.UTC)
+    return date.astimezone(dateutil.tz.UTC)
+
+
+def parse_iso8601_timestamp(value):
+    """ Parse an ISO-8601 date from the TV API to a unix timestamp. Dates without a timezone are in UTC.
+
+    :param str value:                   The date to parse.
+
+    :returns:                           The date as a unix timestamp.
+    :rtype: int
+    """
+    parts = _split_iso8601(value)
+    if parts is not None:
+        return timegm(parts)
+    return timegm(parse_iso8601(value).utctimetuple())
 
 
 def find_image(images, image_type):
@@ -43,67 +203,102 @@ def find_image(images, image_type):
     return None
 
 
-def check_deals_entitlement(deals, offers):
-    """ Check if we have are entitled to play an item.
-
-    :param List[object] deals:          A list of deals.
-    :param List[str] offers:            A list of the offers that we have.
+class EntitlementChecker:
+    """ Check if we are entitled to play items, for a lot of items at once.
 
-    :returns:                           Returns False if we have no deal, True if we have a non-expiring deal or a datetime with the expiry date.
-    :rtype: bool|datetime
+    The offers and the current time are only prepared once, and since most items share the same deals, we remember the
+    result of every combination of deals that we have seen.
     """
 
-    # The API supports multiple deals for an item. A deal contains a list of offers it applies on, it can
-    # also have a start and end time to indicate when the deal is active.
-    #
-    # This allows to define if something is playable for a specific offer, and to indicate the timeslot when this is
-    # available.
-    #
-    # Example:
-    # deals = [{'offers': ['0', '1', '2', '11'], 'start': '2020-07-30T09:15:00Z', 'end': '2020-07-30T10:25:00Z'},
-    #          {'offers': ['0', '1', '2', '11'], 'start': '2020-07-30T10:30:00Z', 'end': '2020-08-06T09:15:00Z'}]
-
-    # If we have no offers or deals, this isn't allowed
-    if not offers or not deals:
-        return False
+    def __init__(self, offers, now=None):
+        """ Initialisation of the class.
+
+        :param List[str]|frozenset[str] offers: The offers that we have.
+        :param datetime now:            The time in UTC to check the deals against. Defaults to the current time.
+        """
+        self._offers = offers if isinstance(offers, frozenset) else frozenset(offers or [])
+        self._now = (now or datetime.utcnow()).replace(microsecond=0).isoformat() + 'Z'
+        self._results = {}
+
+    def check(self, deals):
+        """ Check if we are entitled to play an item.
+
+        :param List[object] deals:      A list of deals.
+
+        :returns:                       Returns False if we have no deal, True if we have a non-expiring deal or a datetime with the expiry date.
+        :rtype: bool|datetime
+        """
+        # If we have no offers or deals, this isn't allowed
+        if not self._offers or not deals:
+            return False
+
+        key = tuple((deal.get('start'), deal.get('end'), tuple(deal.get('offers', []))) for deal in deals)
+        if key not in self._results:
+            self._results[key] = self._check_deals(key)
+        return self._results[key]
+
+    def _check_deals(self, deals):
+        """ Check if one of the deals gives us access.
+
+        :param tuple deals:             A tuple of (start, end, offers) tuples.
+
+        :rtype: bool|datetime
+        """
+        # The API supports multiple deals for an item. A deal contains a list of offers it applies on, it can
+        # also have a start and end time to indicate when the deal is active.
+        #
+        # This allows to define if something is playable for a specific offer, and to indicate the timeslot when this is
+        # available.
+        #
+        # Example:
+        # deals = [{'offers': ['0', '1', '2', '11'], 'start': '2020-07-30T09:15:00Z', 'end': '2020-07-30T10:25:00Z'},
+        #          {'offers': ['0', '1', '2', '11'], 'start': '2020-07-30T10:30:00Z', 'end': '2020-08-06T09:15:00Z'}]
+
+        # Check all deals, keep the best
+        best_deal = None
+        for start, end, deal_offers in deals:
+            # Check if deal is active
+            if start and end and not start <= self._now <= end:
+                continue
+
+            # Check if we have a matching offer
+            if self._offers.isdisjoint(deal_offers):
+                continue
+
+            if end is None:
+                # We have a deal that doesn't expire
+                # It won't get any better
+                return True
+
+            if best_deal is None or end > best_deal:
+                # Keep the best deal
+                best_deal = end
+
+        if best_deal is not None:
+            return parse_iso8601(best_deal).astimezone(tz=get_local_timezone())
 
-    our_offers = set(offers)
-    now = datetime.utcnow().replace(microsecond=0).isoformat() + 'Z'
-
-    # Check all deals, keep the best
-    best_deal = None
-    for deal in deals:
-        # Check if deal is active
-        start = deal.get('start', None)
-        end = deal.get('end', None)
-        if start and end and not start <= now <= end:
-            continue
-
-        # Check if we have a matching offer
-        deal_offers = set(deal.get('offers', []))
-        if not our_offers & deal_offers:
-            continue
+        return False
 
-        if end is None:
-            # We have a deal that doesn't expire
-            # It won't get any better
-            return True
 
-        if best_deal is None or end > best_deal:
-            # Keep the best deal
-            best_deal = end
+def check_deals_entitlement(deals, offers):
+    """ Check if we are entitled to play an item.
 
-    if best_deal is not None:
-        return dateutil.parser.parse(best_deal).astimezone(tz=dateutil.tz.tzlocal())
+    :param List[object] deals:          A list of deals.
+    :param List[str]|EntitlementChecker offers: The offers that we have, or a checker for these offers when we parse a lot of items.
 
-    return False
+    :returns:                           Returns False if we have no deal, True if we have a non-expiring deal or a datetime with the expiry date.
+    :rtype: bool|datetime
+    """
+    if not isinstance(offers, EntitlementChecker):
+        offers = EntitlementChecker(offers)
+    return offers.check(deals)
 
 
 def parse_channel(channel, offers=None, station_id=None):
     """ Parse the API result of a channel into a Channel object.
 
     :param dict channel:                The channel info from the API.
-    :param List[str] offers:            A list of offers that we have.
+    :param List[str]|EntitlementChecker offers: The offers that we have.
     :param str station_id:              The station ID of the CAPI.
 
     :returns:                           A channel that is parsed.
@@ -129,7 +324,7 @@ def parse_epg(program, offers=None):
     """ Parse an Epg dict from the TV API.
 
     :param dict program:                The program object to parse.
-    :param List[str] offers:            A list of offers that we have.
+    :param List[str]|EntitlementChecker offers: The offers that we have.
 
     :returns:                           A program that is parsed.
     :rtype: Epg
@@ -138,8 +333,8 @@ def parse_epg(program, offers=None):
         return None
 
     # Parse dates and convert from UTC to local timezone
-    start = dateutil.parser.parse(program.get('params', {}).get('start')).replace(tzinfo=dateutil.tz.UTC).astimezone(tz=dateutil.tz.tzlocal())
-    end = dateutil.parser.parse(program.get('params', {}).get('end')).replace(tzinfo=dateutil.tz.UTC).astimezone(tz=dateutil.tz.tzlocal())
+    start = parse_iso8601(program.get('params', {}).get('start')).astimezone(tz=get_local_timezone())
+    end = parse_iso8601(program.get('params', {}).get('end')).astimezone(tz=get_local_timezone())
 
     season = program.get('params', {}).get('seriesSeason')
     episode = program.get('params', {}).get('seriesEpisode')
@@ -207,9 +402,9 @@ def parse_epg_capi(program, tenant):
         return None
 
     # Parse dates and convert from UTC to local timezone
-    start = datetime.fromtimestamp(program.get('start') / 1000, tz=dateutil.tz.UTC).astimezone(tz=dateutil.tz.tzlocal())
-    end = datetime.fromtimestamp(program.get('end') / 1000, tz=dateutil.tz.UTC).astimezone(tz=dateutil.tz.tzlocal())
-    now = datetime.now(tz=dateutil.tz.tzlocal())
+    start = datetime.fromtimestamp(program.get('start') / 1000, tz=dateutil.tz.UTC).astimezone(tz=get_local_timezone())
+    end = datetime.fromtimestamp(program.get('end') / 1000, tz=dateutil.tz.UTC).astimezone(tz=get_local_timezone())
+    now = datetime.now(tz=get_local_timezone())
 
     # Parse credits
     credit_list = []
@@ -322,26 +517,76 @@ def parse_vod_episode(asset):
     )
 
 
-def http_get(url, params=None, token_bearer=None, token_cookie=None):
+def http_get(url, params=None, token_bearer=None, token_cookie=None, cache_ttl=None, cache_scope=None, auth=None):
     """ Make a HTTP GET request for the specified URL.
 
     :param str url:                     The URL to call.
     :param dict params:                 The query parameters to include to the URL.
     :param str token_bearer:            The token to use in Bearer authentication.
     :param str token_cookie:            The token to use in Cookie authentication.
+    :param int cache_ttl:               The number of seconds we can serve this response from the cache.
+    :param str cache_scope:             A key of the account, so cached responses are never shared between accounts.
+    :param resources.lib.solocoo.auth.AuthApi auth: The Authentication object. When given, we renew our tokens once when they are
+                                        rejected, and do the request again.
 
     :returns:                           The HTTP Response object.
     :rtype: requests.Response
     """
+    if auth is not None:
+        return _with_token_renewal(auth, http_get, url, params=params, token_bearer=token_bearer, token_cookie=token_cookie,
+                                   cache_ttl=cache_ttl, cache_scope=cache_scope)
+
+    if cache_ttl is None:
+        try:
+            return _request('GET', url=url, params=params, token_bearer=token_bearer, token_cookie=token_cookie)
+        except HTTPError as ex:
+            if ex.response.status_code == 401:
+                raise InvalidTokenException
+            raise
+
+    cache = _get_http_cache()
+    cache_key = cache.make_key('GET', url, params, cache_scope)
+
+    # Serve from the cache if we have a fresh response
+    entry = cache.get(cache_key)
+    if entry is not None and cache.is_fresh(entry):
+        _LOGGER.debug('Serving GET %s from the cache', url)
+        return _cached_response(entry.get('data'))
+
+    # Ask the server to revalidate our expired response
+    headers = {}
+    if entry is not None:
+        if entry.get('data', {}).get('etag'):
+            headers['If-None-Match'] = entry.get('data').get('etag')
+        if entry.get('data', {}).get('last_modified'):
+            headers['If-Modified-Since'] = entry.get('data').get('last_modified')
+
     try:
-        return _request('GET', url=url, params=params, token_bearer=token_bearer, token_cookie=token_cookie)
+        response = _request('GET', url=url, params=params, token_bearer=token_bearer, token_cookie=token_cookie, headers=headers)
     except HTTPError as ex:
         if ex.response.status_code == 401:
             raise InvalidTokenException
         raise
 
+    if response.status_code == 304 and entry is not None:
+        _LOGGER.debug('Cached response for GET %s is still valid', url)
+        cache.touch(cache_key, cache_ttl)
+        return _cached_response(entry.get('data'))
+
+    cache.set(cache_key, dict(
+        url=response.url,
+        status_code=response.status_code,
+        encoding=response.encoding,
+        content_type=response.headers.get('Content-Type'),
+        etag=response.headers.get('ETag'),
+        last_modified=response.headers.get('Last-Modified'),
+        body=response.text,
+    ), cache_ttl)
 
-def http_post(url, params=None, form=None, data=None, token_bearer=None, token_cookie=None):
+    return response
+
+
+def http_post(url, params=None, form=None, data=None, token_bearer=None, token_cookie=None, auth=None):
     """ Make a HTTP POST request for the specified URL.
 
     :param str url:                     The URL to call.
@@ -350,10 +595,16 @@ def http_post(url, params=None, form=None, data=None, token_bearer=None, token_c
     :param dict data:                   A dictionary with json parameters to POST.
     :param str token_bearer:            The token to use in Bearer authentication.
     :param str token_cookie:            The token to use in Cookie authentication.
+    :param resources.lib.solocoo.auth.AuthApi auth: The Authentication object. When given, we renew our tokens once when they are
+                                        rejected, and do the request again.
 
     :returns:                           The HTTP Response object.
     :rtype: requests.Response
     """
+    if auth is not None:
+        return _with_token_renewal(auth, http_post, url, params=params, form=form, data=data, token_bearer=token_bearer,
+                                   token_cookie=token_cookie)
+
     try:
         return _request('POST', url=url, params=params, form=form, data=data, token_bearer=token_bearer,
                         token_cookie=token_cookie)
@@ -363,7 +614,32 @@ def http_post(url, params=None, form=None, data=None, token_bearer=None, token_c
         raise
 
 
-def _request(method, url, params=None, form=None, data=None, token_bearer=None, token_cookie=None):
+def _with_token_renewal(auth, func, *args, **kwargs):
+    """ Do a request, and when our tokens are rejected, renew them and do the request again with the new tokens.
+
+    :param resources.lib.solocoo.auth.AuthApi auth: The Authentication object.
+    :param callable func:               The function that does the request.
+
+    :returns:                           The HTTP Response object.
+    :rtype: requests.Response
+    """
+    # Remember the token that we send, since another thread might renew our tokens while we wait for the reply
+    jwt_token = kwargs.get('token_bearer') or auth.get_tokens().jwt_token
+    try:
+        return func(*args, **kwargs)
+    except InvalidTokenException:
+        _LOGGER.debug('Our tokens have been rejected, renewing them')
+
+    # Requests that fail at the same time will share the same renewal
+    tokens = auth.renew_tokens(jwt_token)
+    if kwargs.get('token_bearer'):
+        kwargs['token_bearer'] = tokens.jwt_token
+    if kwargs.get('token_cookie'):
+        kwargs['token_cookie'] = tokens.aspx_token
+    return func(*args, **kwargs)
+
+
+def _request(method, url, params=None, form=None, data=None, token_bearer=None, token_cookie=None, headers=None):
     """ Makes a request for the specified URL.
 
     :param str method:                  The HTTP Method to use.
@@ -373,6 +649,7 @@ def _request(method, url, params=None, form=None, data=None, token_bearer=None,
     :param dict data:                   A dictionary with json parameters to POST.
     :param str token_bearer:            The token to use in Bearer authentication.
     :param str token_cookie:            The token to use in Cookie authentication.
+    :param dict headers:                Additional headers to send.
 
     :returns:                           The HTTP Response object.
     :rtype: requests.Response
@@ -387,12 +664,9 @@ def _request(method, url, params=None, form=None, data=None, token_bearer=None,
     else:
         _LOGGER.debug('Sending %s %s', method, url)
 
+    headers = dict(headers or {})
     if token_bearer:
-        headers = {
-            'authorization': 'Bearer ' + token_bearer,
-        }
-    else:
-        headers = {}
+        headers['authorization'] = 'Bearer ' + token_bearer
 
     if token_cookie:
         cookies = {
@@ -401,15 +675,77 @@ def _request(method, url, params=None, form=None, data=None, token_bearer=None,
     else:
         cookies = {}
 
-    response = SESSION.request(method, url, params=params, data=form, json=data, headers=headers, cookies=cookies, proxies=PROXIES)
+    response = SESSION.request(method, url, params=params, data=form, json=data, headers=headers, cookies=cookies, proxies=get_proxies(),
+                               timeout=REQUEST_TIMEOUT)
 
     # Set encoding to UTF-8 if no charset is indicated in http headers (https://github.com/psf/requests/issues/1604)
     if not response.encoding:
         response.encoding = 'utf-8'
 
-    _LOGGER.debug('Got response (status=%s): %s', response.status_code, response.text)
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        _LOGGER.debug('Got response (status=%s): %s', response.status_code, _LogBody(response))
 
     # Raise a generic HTTPError exception when we got an non-okay status code.
     response.raise_for_status()
 
     return response
+
+
+class _LogBody:
+    """ Wrapper around the body of a response that is only decoded when the log record is actually formatted. """
+
+    def __init__(self, response):
+        """ Initialisation of the class.
+
+        :param requests.Response response: The response to log.
+        """
+        self._response = response
+
+    def __str__(self):
+        """ Return the (truncated) body of the response. """
+        content = self._response.content
+        if LOG_BODY_LIMIT is not None and len(content) > LOG_BODY_LIMIT:
+            # Decode a bit more bytes than we need since characters can be multiple bytes
+            text = content[:LOG_BODY_LIMIT * 4].decode(self._response.encoding or 'utf-8', 'replace')[:LOG_BODY_LIMIT]
+            return '%s... (%d bytes)' % (text, len(content))
+        return content.decode(self._response.encoding or 'utf-8', 'replace')
+
+    __unicode__ = __str__
+
+
+def get_proxies():
+    """ Return the proxies we need to use. We only ask Kodi for its proxy settings when we need them, and keep them for a while.
+
+    :rtype: dict|None
+    """
+    cached = getattr(get_proxies, 'cached', None)
+    if cached is None or cached[0] + PROXIES_TTL < time.time():
+        get_proxies.cached = (time.time(), kodiutils.get_proxies())
+    return get_proxies.cached[1]
+
+
+def _get_http_cache():
+    """ Return the cache we use for HTTP responses.
+
+    :rtype: FileCache
+    """
+    if not hasattr(_get_http_cache, 'cached'):
+        _get_http_cache.cached = FileCache(os.path.join(kodiutils.get_cache_path(), 'http'), HTTP_CACHE_SIZE)
+    return getattr(_get_http_cache, 'cached')
+
+
+def _cached_response(data):
+    """ Build a Response object based on a cached response.
+
+    :param dict data:                   The cached response.
+
+    :returns:                           The HTTP Response object.
+    :rtype: requests.Response
+    """
+    response = requests.Response()
+    response.url = data.get('url')
+    response.status_code = data.get('status_code')
+    response.encoding = data.get('encoding')
+    response.headers = CaseInsensitiveDict({'Content-Type': data.get('content_type') or ''})
+    response._content = data.get('body').encode(data.get('encoding'))  # pylint: disable=protected-access
+    return response
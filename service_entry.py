@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""Service entry point"""
+
+from __future__ import absolute_import, division, unicode_literals
+
+from xbmcaddon import Addon
+
+from resources.lib import kodiutils, kodilogging
+
+# Reinitialise ADDON every invocation to fix an issue that settings are not fresh.
+kodiutils.ADDON = Addon()
+kodilogging.ADDON = Addon()
+
+if __name__ == '__main__':
+    from resources.lib.service import run
+
+    run()
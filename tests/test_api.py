@@ -6,12 +6,15 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import logging
+import shutil
+import tempfile
 import unittest
 
 from resources.lib import kodiutils
 from resources.lib.solocoo import Channel, StreamInfo, Epg, EpgSeries
 from resources.lib.solocoo.asset import AssetApi
 from resources.lib.solocoo.auth import AuthApi
+from resources.lib.solocoo.cache import FileCache
 from resources.lib.solocoo.exceptions import NotAvailableInOfferException
 
 _LOGGER = logging.getLogger(__name__)
@@ -68,6 +71,29 @@ class TestChannel(unittest.TestCase):
         self.assertIsInstance(programs, list)
         self.assertIsInstance(programs[0], Epg)
 
+    def test_get_asset_cached(self):
+        channel_id = 'JIY-fyHDkM1Rk260f-WNXlVD8iYnlDtWOQ4ah0hb'  # één
+
+        path = tempfile.mkdtemp()
+        try:
+            cache = FileCache(path)
+            api = AssetApi(self._auth, cache=cache)
+
+            program = next(program for program in api.get_replay(channel_id) if isinstance(program, Epg))
+            asset = api.get_asset(program.uid)
+            self.assertIsInstance(asset, Epg)
+
+            # The second time, the asset comes from the cache
+            entry = cache.get(cache.make_key('asset', program.uid, self._auth.get_cache_scope()))
+            self.assertTrue(cache.is_fresh(entry))
+            self.assertEqual(api.get_asset(program.uid).uid, asset.uid)
+
+            # We don't cache channels, since they contain what is airing now
+            api.get_asset(channel_id)
+            self.assertIsNone(cache.get(cache.make_key('asset', channel_id, self._auth.get_cache_scope())))
+        finally:
+            shutil.rmtree(path)
+
 
 if __name__ == '__main__':
     unittest.main()
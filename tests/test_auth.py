@@ -8,8 +8,11 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 import logging
 import random
 import string
+import time
 import unittest
 
+import jwt
+
 from resources.lib import kodiutils
 from resources.lib.solocoo.auth import AuthApi, AccountStorage
 from resources.lib.solocoo.exceptions import InvalidLoginException
@@ -35,6 +38,16 @@ class TestAuth(unittest.TestCase):
         entitlements = auth.list_entitlements()
         self.assertIsInstance(entitlements, dict)
 
+        offers = auth.get_offers()
+        self.assertIsInstance(offers, frozenset)
+
+        # A new instance reuses the cached entitlements of this session
+        auth = AuthApi(kodiutils.get_setting('username'),
+                       kodiutils.get_setting('password'),
+                       kodiutils.get_setting('tenant'),
+                       kodiutils.get_tokens_path())
+        self.assertEqual(auth.list_entitlements(), entitlements)
+
     # def test_anonymous(self):
     #     auth = AuthApi('',
     #                    '',
@@ -53,5 +66,24 @@ class TestAuth(unittest.TestCase):
         return '%s@%s' % (''.join(random.choice(string.ascii_letters) for i in range(12)), domain)
 
 
+class TestAccountStorage(unittest.TestCase):
+
+    def test_token_expiry(self):
+        account = AccountStorage()
+        self.assertFalse(account.is_valid_token())
+        self.assertEqual(account.get_token_expiry(), 0)
+
+        expiry = int(time.time()) + 30
+        account.jwt_token = jwt.encode({'exp': expiry}, 'a-secret-that-is-long-enough-for-hs256', algorithm='HS256')
+        self.assertEqual(account.get_token_expiry(), expiry)
+        self.assertTrue(account.is_valid_token())
+
+        # This token expires too soon to be used for a request
+        self.assertFalse(account.is_valid_token(AuthApi.RENEW_MARGIN))
+
+        account.jwt_token = 'invalid'
+        self.assertFalse(account.is_valid_token())
+
+
 if __name__ == '__main__':
     unittest.main()
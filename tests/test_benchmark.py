@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+""" Micro-benchmarks for the parsing of the EPG """
+
+# pylint: disable=missing-docstring,no-self-use
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+import logging
+import timeit
+import unittest
+from calendar import timegm
+from datetime import datetime, timedelta
+
+import dateutil.parser
+import dateutil.tz
+
+from resources.lib.solocoo import Epg, util
+from resources.lib.solocoo.epg import LazyPrograms
+
+try:  # Python 3
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def make_schedule(channels=20, programs=48):
+    """ Generate a payload that looks like a reply of the /schedule endpoint of the TV API. """
+    start = datetime(2020, 7, 30, 4, 0, 0)
+    epg = {}
+    for channel in range(channels):
+        epg['channel-%d' % channel] = [
+            {
+                'id': 'program-%d-%d' % (channel, program),
+                'title': 'Program %d' % program,
+                'desc': 'Description of program %d' % program,
+                'images': [
+                    {'type': image_type, 'size': size, 'url': 'https://images.example.com/%s/%s/%d.jpg' % (image_type, size, program)}
+                    for image_type in ['po', 'la', 'lv'] for size in ['sm', 'md', 'lg']
+                ],
+                'params': {
+                    'start': (start + timedelta(minutes=30 * program)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                    'end': (start + timedelta(minutes=30 * (program + 1))).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                    'channelId': 'channel-%d' % channel,
+                    'formats': [{'id': 'HD', 'title': 'HD'}],
+                    'genres': [{'id': 'news', 'title': 'News'}],
+                    'replay': True,
+                    'restart': True,
+                    'seriesSeason': '1',
+                    'seriesEpisode': str(program + 1),
+                    'credits': [{'role': 'Actor', 'person': 'Person %d' % program, 'character': 'Character'}],
+                },
+                'deals': [{'offers': ['0', '1', '2', '11'], 'start': '2020-07-30T00:00:00Z', 'end': '2099-08-06T09:15:00Z'}],
+            }
+            for program in range(programs)
+        ]
+    return epg
+
+
+def make_assets(count=1000):
+    """ Generate a payload that looks like a reply of the /assets endpoint of the TV API. """
+    return {
+        'assets': [
+            {
+                'id': 'asset-%d' % asset,
+                'type': 'VOD',
+                'title': 'Movie %d' % asset,
+                'images': [
+                    {'type': image_type, 'size': size, 'url': 'https://images.example.com/%s/%s/%d.jpg' % (image_type, size, asset)}
+                    for image_type in ['bg', 'lv', 'la', 'po'] for size in ['sm', 'md', 'lg']
+                ],
+            }
+            for asset in range(count)
+        ]
+    }
+
+
+def index_images(images):
+    """ Find the largest image of every type in one pass over the images. """
+    urls = {}
+    ranks = {}
+    for image in images or []:
+        rank = {'lg': 0, 'md': 1, 'sm': 2}.get(image.get('size'), 3)
+        if rank < ranks.get(image.get('type'), 3):
+            ranks[image.get('type')] = rank
+            urls[image.get('type')] = image.get('url')
+    return urls
+
+
+SCHEDULE = make_schedule()
+ASSETS = make_assets()
+PROGRAMS = [program for programs in SCHEDULE.values() for program in programs]
+
+
+class LegacyModel:
+    """ A model like we used to have them, backed by a __dict__ and without shared strings. """
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def legacy_parse_epg(program):
+    """ Parse a program like we used to do. """
+    epg = util.parse_epg(program)
+    values = {key: getattr(epg, key) for key in Epg.__slots__}
+    values.update(
+        formats=[epg_format.get('title') for epg_format in program['params']['formats']],
+        genres=[epg_genre.get('title') for epg_genre in program['params']['genres']],
+        credit=[LegacyModel(role=credit.get('role'), person=credit.get('person'), character=credit.get('character'))
+                for credit in program['params']['credits']],
+    )
+    return LegacyModel(**values)
+
+
+class TestBenchmark(unittest.TestCase):
+
+    @staticmethod
+    def _measure(func, number=3):
+        """ Return the best time of a few runs. """
+        return min(timeit.repeat(func, number=1, repeat=number))
+
+    def test_parse_iso8601(self):
+        dates = [program['params']['start'] for program in PROGRAMS] + [program['params']['end'] for program in PROGRAMS]
+
+        def dateutil_parser():
+            return [dateutil.parser.parse(date).replace(tzinfo=dateutil.tz.UTC).astimezone(tz=dateutil.tz.tzlocal()) for date in dates]
+
+        def fast_parser():
+            return [util.parse_iso8601(date).astimezone(tz=util.get_local_timezone()) for date in dates]
+
+        self.assertEqual(dateutil_parser(), fast_parser())
+
+        slow, fast = self._measure(dateutil_parser), self._measure(fast_parser)
+        _LOGGER.info('Parsing %d dates: dateutil=%.4fs, fast=%.4fs (%.1fx)', len(dates), slow, fast, slow / fast)
+        self.assertLess(fast, slow)
+
+    def test_find_image(self):
+        assets = ASSETS['assets']
+
+        def find_image():
+            return [(util.find_image(asset['images'], 'po'), util.find_image(asset['images'], 'la')) for asset in assets]
+
+        def single_pass():
+            return [(images.get('po'), images.get('la')) for images in (index_images(asset['images']) for asset in assets)]
+
+        self.assertEqual(find_image(), single_pass())
+
+        # Scanning per size stops at the first match, so this is as fast as a single pass for the short lists that the API
+        # returns. We keep this benchmark so we notice when the API starts to return a lot more images.
+        per_size, index = self._measure(find_image), self._measure(single_pass)
+        _LOGGER.info('Finding images of %d assets: find_image=%.4fs, single pass=%.4fs', len(assets), per_size, index)
+
+    def test_interval_index(self):
+        guide = {channel: [util.parse_epg(program) for program in programs] for channel, programs in SCHEDULE.items()}
+        index = {channel: LazyPrograms.from_programs(programs) for channel, programs in guide.items()}
+
+        # Look up what is on every 5 minutes of the day
+        start = min(program.start for programs in guide.values() for program in programs)
+        times = [start + timedelta(minutes=5 * step) for step in range(288)]
+        timestamps = [timegm(time.utctimetuple()) for time in times]
+
+        def list_scan():
+            return [next((program for program in programs if program.start <= time < program.end), None)
+                    for programs in guide.values() for time in times]
+
+        def bisect():
+            return [programs.get_at(timestamp) for programs in index.values() for timestamp in timestamps]
+
+        self.assertEqual(list_scan(), bisect())
+
+        slow, fast = self._measure(list_scan), self._measure(bisect)
+        _LOGGER.info('Looking up %d times on %d channels: list scan=%.4fs, index=%.4fs (%.1fx)', len(times), len(guide), slow, fast, slow / fast)
+        self.assertLess(fast, slow)
+
+    @unittest.skipIf(tracemalloc is None, 'Skipping since tracemalloc is not available.')
+    def test_model_memory(self):
+        raw = json.dumps(SCHEDULE)
+
+        def retained(parse):
+            """ Return the memory that is kept by the parsed programs after the payload is released. """
+            tracemalloc.start()
+            try:
+                payload = json.loads(raw)
+                programs = [parse(program) for programs in payload.values() for program in programs]
+                del payload
+                return tracemalloc.get_traced_memory()[0], programs
+            finally:
+                tracemalloc.stop()
+
+        legacy, _ = retained(legacy_parse_epg)
+        slots, programs = retained(util.parse_epg)
+        _LOGGER.info('Memory for %d programs: legacy=%d bytes, slots=%d bytes (%.0f%% less)',
+                     len(programs), legacy, slots, 100 - 100 * slots / legacy)
+        self.assertLess(slots, legacy)
+
+
+if __name__ == '__main__':
+    unittest.main()
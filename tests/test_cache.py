@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+""" Tests for the Cache """
+
+# pylint: disable=missing-docstring,no-self-use
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from resources.lib.solocoo import util
+from resources.lib.solocoo.cache import FileCache, FileLock
+
+_LOGGER = logging.getLogger(__name__)
+
+URL = 'https://example.com/bouquet'
+
+
+def make_response(status_code, body=b'', headers=None):
+    """ Build a response like the one we would get from the server. """
+    response = requests.Response()
+    response.url = URL
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = body  # pylint: disable=protected-access
+    return response
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self._path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._path)
+
+    def test_get_set(self):
+        cache = FileCache(self._path)
+        key = cache.make_key('GET', 'https://example.com/bouquet', {'a': 1}, 'tvv:hash')
+
+        self.assertIsNone(cache.get(key))
+
+        cache.set(key, {'body': 'test'}, 60)
+        entry = cache.get(key)
+        self.assertEqual(entry.get('data'), {'body': 'test'})
+        self.assertTrue(cache.is_fresh(entry))
+
+        cache.delete(key)
+        self.assertIsNone(cache.get(key))
+
+    def test_expired(self):
+        cache = FileCache(self._path)
+        key = cache.make_key('expired')
+
+        cache.set(key, 'test', -1)
+        entry = cache.get(key)
+        self.assertFalse(cache.is_fresh(entry))
+
+        # Revalidation extends the lifetime
+        cache.touch(key, 60)
+        self.assertTrue(cache.is_fresh(cache.get(key)))
+
+    def test_scope(self):
+        self.assertNotEqual(FileCache.make_key('GET', 'https://example.com', None, 'tvv:one'),
+                            FileCache.make_key('GET', 'https://example.com', None, 'tvv:two'))
+
+    def test_eviction(self):
+        cache = FileCache(self._path, max_size=3000)
+
+        for i in range(5):
+            cache.set(cache.make_key(i), 'x' * 1000)
+
+            # Make sure the modification times differ
+            os.utime(os.path.join(self._path, cache.make_key(i) + '.json'), (time.time() - 100 + i, time.time() - 100 + i))
+
+        # The oldest entries are removed
+        self.assertIsNone(cache.get(cache.make_key(0)))
+        self.assertIsNotNone(cache.get(cache.make_key(4)))
+
+    def test_lock(self):
+        filename = os.path.join(self._path, 'test.lock')
+
+        with FileLock(filename):
+            self.assertTrue(os.path.exists(filename))
+
+            # Another process has to wait for us
+            self.assertFalse(FileLock(filename, timeout=0.2).acquire())
+
+        self.assertFalse(os.path.exists(filename))
+
+    def test_lock_stale(self):
+        filename = os.path.join(self._path, 'test.lock')
+
+        # A lock that was left behind by a crashed process
+        with open(filename, 'w'):
+            pass
+        os.utime(filename, (time.time() - 120, time.time() - 120))
+
+        lock = FileLock(filename, timeout=0.2, stale_after=60)
+        self.assertTrue(lock.acquire())
+        lock.release()
+        self.assertFalse(os.path.exists(filename))
+
+
+class TestHttpCache(unittest.TestCase):
+
+    def setUp(self):
+        self._path = tempfile.mkdtemp()
+        self._cache = FileCache(self._path)
+        util._get_http_cache.cached = self._cache  # pylint: disable=protected-access
+
+        patcher = mock.patch.object(util, 'get_proxies', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        del util._get_http_cache.cached  # pylint: disable=protected-access
+        shutil.rmtree(self._path)
+
+    def test_fresh(self):
+        reply = make_response(200, '{"title": "één"}'.encode('utf-8'), {'Content-Type': 'application/json; charset=utf-8'})
+        with mock.patch.object(util.SESSION, 'request', return_value=reply) as request:
+            util.http_get(URL, cache_ttl=60, cache_scope='tvv:hash')
+            response = util.http_get(URL, cache_ttl=60, cache_scope='tvv:hash')
+            self.assertEqual(request.call_count, 1)
+
+        # The cached response can be used like the original one
+        self.assertIsInstance(response, requests.Response)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.url, URL)
+        self.assertEqual(response.headers.get('Content-Type'), 'application/json; charset=utf-8')
+        self.assertEqual(response.json(), {'title': 'één'})
+
+    def test_revalidate_not_modified(self):
+        key = self._cache.make_key('GET', URL, None, 'tvv:hash')
+        self._cache.set(key, dict(url=URL, status_code=200, encoding='utf-8', content_type='application/json', etag='"v1"',
+                                  last_modified='Wed, 21 Oct 2015 07:28:00 GMT', body='{"title": "cached"}'), -1)
+
+        with mock.patch.object(util.SESSION, 'request', return_value=make_response(304)) as request:
+            response = util.http_get(URL, cache_ttl=60, cache_scope='tvv:hash')
+
+        headers = request.call_args[1].get('headers')
+        self.assertEqual(headers.get('If-None-Match'), '"v1"')
+        self.assertEqual(headers.get('If-Modified-Since'), 'Wed, 21 Oct 2015 07:28:00 GMT')
+        self.assertEqual(response.json(), {'title': 'cached'})
+
+        # The server has confirmed our response, so we can use it again for a while
+        self.assertTrue(self._cache.is_fresh(self._cache.get(key)))
+
+    def test_revalidate_modified(self):
+        key = self._cache.make_key('GET', URL, None, 'tvv:hash')
+        self._cache.set(key, dict(url=URL, status_code=200, encoding='utf-8', content_type='application/json', etag='"v1"',
+                                  last_modified=None, body='{"title": "cached"}'), -1)
+
+        reply = make_response(200, b'{"title": "new"}', {'Content-Type': 'application/json', 'ETag': '"v2"'})
+        with mock.patch.object(util.SESSION, 'request', return_value=reply) as request:
+            response = util.http_get(URL, cache_ttl=60, cache_scope='tvv:hash')
+
+        self.assertEqual(request.call_args[1].get('headers'), {'If-None-Match': '"v1"'})
+        self.assertEqual(response.json(), {'title': 'new'})
+
+        # The new response replaces the cached one
+        entry = self._cache.get(key)
+        self.assertTrue(self._cache.is_fresh(entry))
+        self.assertEqual(entry.get('data').get('etag'), '"v2"')
+        self.assertEqual(entry.get('data').get('body'), '{"title": "new"}')
+
+
+if __name__ == '__main__':
+    unittest.main()
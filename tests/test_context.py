@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+""" Tests for the shared API context """
+
+# pylint: disable=missing-docstring,no-self-use
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+import unittest
+
+from resources.lib import kodiutils
+from resources.lib.modules import context
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@unittest.skipUnless(kodiutils.get_setting('username') and kodiutils.get_setting('password'), 'Skipping since we have no credentials.')
+class TestContext(unittest.TestCase):
+
+    def test_reuse(self):
+        first = context.get_context()
+        second = context.get_context()
+
+        # The context and its API objects are kept between invocations
+        self.assertIs(first, second)
+        self.assertIs(first.get_asset_api(), second.get_asset_api())
+        self.assertIs(first.get_auth().get_tokens(), second.get_asset_api()._tokens)  # pylint: disable=protected-access
+
+    def test_credentials_change(self):
+        first = context.get_context()
+
+        # Pretend that the credentials have been changed in the settings
+        first.key = ('other', 'credentials', 'tvv')
+
+        second = context.get_context()
+        self.assertIsNot(first, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,15 +6,47 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import logging
+import os
+import shutil
+import tempfile
+import time
 import unittest
+from datetime import timedelta
 
 from resources.lib import kodiutils
 from resources.lib.solocoo import Epg
-from resources.lib.solocoo.auth import AuthApi
-from resources.lib.solocoo.epg import EpgApi
+from resources.lib.solocoo.asset import AssetApi
+from resources.lib.solocoo.auth import AccountStorage, AuthApi
+from resources.lib.solocoo.cache import FileCache
+from resources.lib.solocoo.epg import EpgApi, LazyPrograms
+from resources.lib.solocoo.store import EpgStore
 
 _LOGGER = logging.getLogger(__name__)
 
+DAY = int(time.time()) // 86400 * 86400
+
+
+class FakeAuth:
+    """ An Authentication object that doesn't need credentials. """
+
+    def get_tokens(self):
+        return AccountStorage()
+
+    def get_tenant(self):
+        return {}
+
+    def get_offers(self):
+        return []
+
+    def get_cache_scope(self):
+        return 'tvv:test'
+
+
+class SingleChannelEpgApi(EpgApi):
+    """ An EPG API that fetches one channel at a time. """
+
+    EPG_CAPI_CHUNK_SIZE = 1
+
 
 @unittest.skipUnless(kodiutils.get_setting('username') and kodiutils.get_setting('password'), 'Skipping since we have no credentials.')
 class TestEpg(unittest.TestCase):
@@ -53,6 +85,157 @@ class TestEpg(unittest.TestCase):
         self.assertIsInstance(programs, list)
         self.assertIsInstance(programs[0], Epg)
 
+    def test_update_now_next(self):
+        api = EpgApi(self._auth)
+
+        channels = AssetApi(self._auth).get_channels()
+        for channel in channels:
+            channel.epg_now = None
+
+        api.update_now_next(channels)
+        self.assertTrue(any(isinstance(channel.epg_now, Epg) for channel in channels))
+
+
+class TestLazyPrograms(unittest.TestCase):
+
+    def test_lazy_programs(self):
+        parsed = []
+
+        def parse(program):
+            parsed.append(program.get('title'))
+            return program.get('title')
+
+        programs = LazyPrograms([{'title': 'first'}, {'title': 'second'}, {'title': 'third'}],
+                                [(DAY, DAY + 3600), (DAY + 3600, DAY + 7200), (DAY + 7200, DAY + 10800)],
+                                parse)
+        self.assertEqual(len(programs), 3)
+        self.assertEqual(parsed, [])
+
+        # Only the programs that we need are parsed
+        self.assertEqual(programs.get_upcoming(DAY + 3600), ['second', 'third'])
+        self.assertEqual(programs.get_upcoming(DAY + 5000, count=1), ['second'])
+        self.assertEqual(programs.get_upcoming(DAY + 10800), [])
+        self.assertEqual(parsed, ['second', 'third'])
+
+        # And they are only parsed once
+        self.assertEqual(list(programs), ['first', 'second', 'third'])
+        self.assertEqual(programs[-1], 'third')
+        self.assertEqual(parsed, ['second', 'third', 'first'])
+
+    def test_interval_queries(self):
+        programs = LazyPrograms([{'title': 'first'}, {'title': 'second'}, {'title': 'fourth'}],
+                                [(DAY, DAY + 3600), (DAY + 3600, DAY + 7200), (DAY + 10800, DAY + 14400)],
+                                lambda program: program.get('title'))
+
+        self.assertIsNone(programs.get_at(DAY - 1))
+        self.assertEqual(programs.get_at(DAY), 'first')
+        self.assertEqual(programs.get_at(DAY + 3600), 'second')
+        self.assertIsNone(programs.get_at(DAY + 9000))  # There is a gap in the guide
+        self.assertIsNone(programs.get_at(DAY + 14400))
+
+        self.assertEqual(programs.get_range(DAY + 1800, DAY + 3601), ['first', 'second'])
+        self.assertEqual(programs.get_range(DAY + 7200, DAY + 10800), [])
+        self.assertEqual(programs.get_range(DAY - 3600, DAY + 86400), ['first', 'second', 'fourth'])
+
+        self.assertEqual(programs.get_upcoming(DAY + 9000, count=5), ['fourth'])
+
+
+class TestEpgPrefetch(unittest.TestCase):
+
+    def setUp(self):
+        self._path = tempfile.mkdtemp()
+        self._store = EpgStore(os.path.join(self._path, 'epg.sqlite'))
+
+    def tearDown(self):
+        self._store.close()
+        shutil.rmtree(self._path)
+
+    def test_prefetch_stores_every_chunk(self):
+        api = SingleChannelEpgApi(FakeAuth(), workers=1, store=self._store)
+        fetched = []
+
+        def fetch(channels, date_from, _):
+            # The chunks that were fetched before are already in the store
+            for channel in fetched:
+                self.assertTrue(self._store.get_programs(EpgStore.SOURCE_CAPI, channel, 0, DAY + 2 * 86400))
+            fetched.extend(channels)
+
+            start = api._to_timestamp(date_from) * 1000  # pylint: disable=protected-access
+            return {channel: [{'start': start, 'end': start + 3600000, 'title': channel}] for channel in channels}
+
+        api._fetch_guide_with_capi = fetch  # pylint: disable=protected-access
+        api.prefetch_guide_with_capi(['1', '2', '3'], 'today')
+        self.assertEqual(sorted(fetched), ['1', '2', '3'])
+
+        # The store is fresh now, so we don't fetch it again
+        api.prefetch_guide_with_capi(['1', '2', '3'], 'today')
+        self.assertEqual(len(fetched), 3)
+
+    def test_prefetch_error(self):
+        api = EpgApi(FakeAuth(), store=self._store)
+
+        def fetch(*_):
+            raise ValueError('Could not fetch the EPG')
+
+        api._fetch_guide_with_capi = fetch  # pylint: disable=protected-access
+        with self.assertRaises(ValueError):
+            api.prefetch_guide_with_capi(['1'], 'today')
+
+
+class FakeChannel:
+    """ A channel from the bouquet without a now and next. """
+
+    def __init__(self, uid):
+        self.uid = uid
+        self.epg_now = None
+        self.epg_next = None
+
+
+def make_program(title, start, end):
+    """ Build a program like the TV API returns it. """
+    return dict(id=title, title=title, images=[], deals=[], params=dict(
+        start=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(start)),
+        end=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(end)),
+        formats=[],
+        genres=[],
+    ))
+
+
+class TestNowNext(unittest.TestCase):
+
+    def setUp(self):
+        self._path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._path)
+
+    def test_update_now_next(self):
+        cache = FileCache(self._path)
+        api = EpgApi(FakeAuth(), cache=cache)
+        now = int(time.time())
+        calls = []
+
+        def fetch(channels, date_from, date_to, max_programs=None):
+            calls.append((channels, date_to - date_from, max_programs))
+            return {channel: [make_program('next', now + 600, now + 1200), make_program('now', now - 600, now + 600)] for channel in channels}
+
+        api._fetch_guide = fetch  # pylint: disable=protected-access
+        channel = FakeChannel('1')
+        api.update_now_next([channel])
+        self.assertEqual((channel.epg_now.title, channel.epg_next.title), ('now', 'next'))
+
+        # We only fetch the now and next of the missing channels, not the whole day
+        self.assertEqual(calls, [(['1'], timedelta(hours=EpgApi.NOW_NEXT_WINDOW), 2)])
+
+        # This is cached until the program that is airing now has ended
+        entry = cache.get(cache.make_key('now_next', 'tvv:test'))
+        self.assertAlmostEqual(entry.get('expires'), now + 600, delta=5)
+
+        channel = FakeChannel('1')
+        api.update_now_next([channel])
+        self.assertEqual(channel.epg_now.title, 'now')
+        self.assertEqual(len(calls), 1)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -7,9 +7,14 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 import json
 import logging
+import os
+import shutil
 import socket
+import tempfile
 import threading
 import unittest
+from unittest import mock
+from xml.etree import ElementTree
 
 from resources.lib import kodiutils
 
@@ -63,6 +68,20 @@ class TestIptvManager(unittest.TestCase):
         self.assertEqual(result['version'], 1)
         self.assertIsInstance(result['epg'], dict)
 
+    def test_xmltv(self):
+        from resources.lib.modules.iptvmanager import IPTVManager
+
+        path = tempfile.mkdtemp()
+        try:
+            filename = IPTVManager().write_xmltv(os.path.join(path, 'epg.xml'), days_past=0, days_future=0)
+
+            # Channels come before the programmes
+            root = ElementTree.parse(filename).getroot()
+            self.assertEqual(root.tag, 'tv')
+            self.assertEqual(root[0].tag, 'channel')
+        finally:
+            shutil.rmtree(path)
+
     @staticmethod
     def _prepare_for_data():
         """Prepare ourselves so we can receive data"""
@@ -115,5 +134,25 @@ class TestIptvManager(unittest.TestCase):
             sock.close()
 
 
+class TestXmltvFilename(unittest.TestCase):
+
+    def test_filename(self):
+        from resources.lib.modules.iptvmanager import IPTVManager
+
+        name = kodiutils.addon_id() + '.xml'
+        with mock.patch.object(kodiutils, 'get_setting', return_value=''):
+            self.assertEqual(IPTVManager._get_xmltv_filename(), os.path.join(kodiutils.addon_profile(), name))  # pylint: disable=protected-access
+
+        # Special paths are translated to a local folder
+        with mock.patch.object(kodiutils, 'get_setting', return_value='special://profile/xmltv/'):
+            filename = IPTVManager._get_xmltv_filename()  # pylint: disable=protected-access
+            self.assertNotIn('://', filename)
+            self.assertTrue(filename.endswith(os.path.join('xmltv', name)))
+
+        # Network shares are written with Kodi
+        with mock.patch.object(kodiutils, 'get_setting', return_value='smb://nas/epg/'):
+            self.assertEqual(IPTVManager._get_xmltv_filename(), 'smb://nas/epg/' + name)  # pylint: disable=protected-access
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+""" Tests for the log handler """
+
+# pylint: disable=missing-docstring,no-self-use
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+import unittest
+
+import xbmc
+
+from resources.lib import kodilogging
+
+
+class TestKodiLogging(unittest.TestCase):
+
+    def setUp(self):
+        self._debug_logging = kodilogging.ADDON.getSetting('debug_logging')
+
+    def tearDown(self):
+        kodilogging.ADDON.setSetting('debug_logging', self._debug_logging)
+        kodilogging.config()
+
+    def test_config_once(self):
+        kodilogging.config()
+        kodilogging.config()
+
+        handlers = [handler for handler in logging.getLogger().handlers if isinstance(handler, kodilogging.KodiLogHandler)]
+        self.assertEqual(len(handlers), 1)
+
+    def test_debug_logging(self):
+        kodilogging.ADDON.setSetting('debug_logging', 'true')
+        kodilogging.config()
+
+        handler = next(handler for handler in logging.getLogger().handlers if isinstance(handler, kodilogging.KodiLogHandler))
+        self.assertEqual(logging.getLogger().level, logging.DEBUG)
+        self.assertEqual(handler.levels[logging.DEBUG], handler.info_level)
+
+        kodilogging.ADDON.setSetting('debug_logging', 'false')
+        kodilogging.config()
+
+        # Debug messages are discarded before they are formatted, unless Kodi logs them
+        self.assertEqual(handler.levels[logging.DEBUG], xbmc.LOGDEBUG)
+        if not xbmc.getCondVisibility('System.GetBool(debug.showloginfo)'):
+            self.assertFalse(logging.getLogger(__name__).isEnabledFor(logging.DEBUG))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+""" Tests for the Kodi utility functions """
+
+# pylint: disable=missing-docstring,no-self-use
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+import logging
+import unittest
+from unittest import mock
+
+from resources.lib import kodiutils
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TestKodiUtils(unittest.TestCase):
+
+    def test_get_global_settings(self):
+        keys = ['network.usehttpproxy', 'network.httpproxyserver']
+
+        # The replies of a batch can come in any order
+        reply = json.dumps([
+            dict(id=1, jsonrpc='2.0', result=dict(value='proxy.example.com')),
+            dict(id=0, jsonrpc='2.0', result=dict(value=True)),
+        ])
+        with mock.patch('xbmc.executeJSONRPC', return_value=reply) as execute:
+            self.assertEqual(kodiutils.get_global_settings(keys), {'network.usehttpproxy': True, 'network.httpproxyserver': 'proxy.example.com'})
+            self.assertEqual(execute.call_count, 1)
+
+    def test_get_global_settings_fallback(self):
+        keys = ['network.usehttpproxy', 'network.httpproxyserver']
+
+        # Without support for batches, we request every setting on its own
+        self.assertEqual(kodiutils.get_global_settings(keys), {key: kodiutils.get_global_setting(key) for key in keys})
+
+        reply = json.dumps(dict(id=None, jsonrpc='2.0', error=dict(code=-32600, message='Invalid request.')))
+        with mock.patch('xbmc.executeJSONRPC', return_value=reply) as execute:
+            self.assertEqual(kodiutils.get_global_settings(keys), {key: None for key in keys})
+            self.assertEqual(execute.call_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+""" Tests for the background service """
+
+# pylint: disable=missing-docstring,no-self-use
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+import unittest
+
+from resources.lib import kodiutils
+from resources.lib.service import BackgroundService
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@unittest.skipUnless(kodiutils.get_setting('username') and kodiutils.get_setting('password'), 'Skipping since we have no credentials.')
+class TestService(unittest.TestCase):
+
+    def test_refresh(self):
+        service = BackgroundService()
+        service.refresh()
+
+        # The first refresh also prefetches the channels and the EPG
+        self.assertNotEqual(service._last_prefetch, 0)  # pylint: disable=protected-access
+
+
+if __name__ == '__main__':
+    unittest.main()
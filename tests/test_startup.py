@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+""" Tests for the startup time of the add-on """
+
+# pylint: disable=missing-docstring,no-self-use
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+import os
+import subprocess
+import sys
+import unittest
+
+try:
+    import routing
+except ImportError:
+    routing = None
+
+_LOGGER = logging.getLogger(__name__)
+
+# These modules are slow to import, and should only be imported by the routes that need them
+HEAVY_MODULES = ['requests', 'dateutil.parser', 'dateutil.tz', 'jwt', 'resources.lib.solocoo.util']
+
+# Our own modules for a local route may take this many times as long to import as the startup of Python itself. We compare
+# with Python on the same machine, so a slow CI machine doesn't make this fail.
+IMPORT_TIME_FACTOR = 3
+
+
+def import_times(*args):
+    """ Run python with -X importtime and return the cumulative import time in microseconds of every imported module,
+    and of the modules that were imported directly by the code that we ran. """
+    cwd = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    process = subprocess.Popen([sys.executable, '-X', 'importtime'] + list(args), cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)  # pylint: disable=consider-using-with
+    _, stderr = process.communicate()
+    if process.returncode != 0:
+        raise Exception('Running %s failed: %s' % (' '.join(args), stderr.decode('utf-8')))
+
+    times = {}
+    top_level = {}
+    for line in stderr.decode('utf-8').splitlines():
+        # The format is: "import time: self [us] | cumulative | imported package", nested imports are indented
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, module = line.split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        times[module.strip()] = int(cumulative)
+        if not module[1:].startswith(' '):
+            top_level[module.strip()] = int(cumulative)
+    return times, top_level
+
+
+def startup_time():
+    """ Return the time in microseconds that Python needs for its own imports when it starts. """
+    _, top_level = import_times('-c', 'pass')
+    return sum(top_level.values())
+
+
+@unittest.skipIf(sys.version_info < (3, 7), 'Skipping since -X importtime needs Python 3.7 or newer.')
+class TestStartup(unittest.TestCase):
+
+    def test_menu_imports(self):
+        times, _ = import_times('-c', 'import resources.lib.modules.menu')
+        self.assertEqual([module for module in HEAVY_MODULES if module in times], [])
+
+        budget = IMPORT_TIME_FACTOR * startup_time()
+        _LOGGER.info('Importing the menu took %d us (budget %d us)', times['resources.lib.modules.menu'], budget)
+        self.assertLess(times['resources.lib.modules.menu'], budget)
+
+    @unittest.skipIf(routing is None, 'Skipping since routing is not available.')
+    def test_menu_route(self):
+        times, top_level = import_times(os.path.join('tests', 'run.py'), '/menu')
+        self.assertEqual([module for module in HEAVY_MODULES if module in times], [])
+
+        budget = IMPORT_TIME_FACTOR * startup_time()
+        spent = sum(time for module, time in top_level.items() if module.startswith('resources.lib'))
+        _LOGGER.info('Importing our modules for the menu route took %d us (budget %d us)', spent, budget)
+        self.assertLess(spent, budget)
+
+
+if __name__ == '__main__':
+    unittest.main()
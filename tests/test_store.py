@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+""" Tests for the EPG Store """
+
+# pylint: disable=missing-docstring,no-self-use
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from resources.lib.solocoo.store import EpgStore
+
+_LOGGER = logging.getLogger(__name__)
+
+DAY = int(time.time()) // 86400 * 86400
+
+
+class TestStore(unittest.TestCase):
+
+    def setUp(self):
+        self._path = tempfile.mkdtemp()
+        self._store = EpgStore(os.path.join(self._path, 'epg.sqlite'))
+
+    def tearDown(self):
+        self._store.close()
+        shutil.rmtree(self._path)
+
+    def test_stale_channels(self):
+        self.assertEqual(self._store.get_stale_channels(EpgStore.SOURCE_CAPI, ['1', '2'], DAY), ['1', '2'])
+
+        self._store.update(EpgStore.SOURCE_CAPI, DAY, ['1'], [])
+        self.assertEqual(self._store.get_stale_channels(EpgStore.SOURCE_CAPI, ['1', '2'], DAY), ['2'])
+        self.assertEqual(self._store.get_stale_channels(EpgStore.SOURCE_TVAPI, ['1', '2'], DAY), ['1', '2'])
+
+    def test_get_programs(self):
+        self._store.update(EpgStore.SOURCE_CAPI, DAY, ['1'], [
+            ('1', DAY + 3600, DAY + 7200, {'title': 'second'}),
+            ('1', DAY, DAY + 3600, {'title': 'first'}),
+        ])
+
+        programs = self._store.get_programs(EpgStore.SOURCE_CAPI, '1', DAY, DAY + 86400)
+        self.assertEqual([program.get('title') for _, _, program in programs], ['first', 'second'])
+        self.assertEqual([(start, end) for start, end, _ in programs], [(DAY, DAY + 3600), (DAY + 3600, DAY + 7200)])
+
+        # Only return programs that overlap with the window
+        programs = self._store.get_programs(EpgStore.SOURCE_CAPI, '1', DAY + 3600, DAY + 86400)
+        self.assertEqual([program.get('title') for _, _, program in programs], ['second'])
+
+    def test_update_replaces_day(self):
+        self._store.update(EpgStore.SOURCE_CAPI, DAY, ['1'], [('1', DAY, DAY + 3600, {'title': 'old'})])
+        self._store.update(EpgStore.SOURCE_CAPI, DAY, ['1'], [('1', DAY + 60, DAY + 3600, {'title': 'new'})])
+
+        programs = self._store.get_programs(EpgStore.SOURCE_CAPI, '1', DAY, DAY + 86400)
+        self.assertEqual([program.get('title') for _, _, program in programs], ['new'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+""" Tests for the utility functions """
+
+# pylint: disable=missing-docstring,no-self-use
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+import os
+import threading
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import dateutil.tz
+import requests
+
+from resources.lib.solocoo import util
+from resources.lib.solocoo.auth import AccountStorage, AuthApi
+from resources.lib.solocoo.exceptions import InvalidTokenException
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class FakeAuth:
+    """ An Authentication object that hands out a new token on every login. """
+
+    def __init__(self):
+        self._account = AccountStorage()
+        self._account.jwt_token = 'token-0'
+        self._renew_lock = threading.Lock()
+        self.logins = 0
+
+    def get_tokens(self):
+        return self._account
+
+    def login(self, force=False):  # pylint: disable=unused-argument
+        time.sleep(0.01)
+        self.logins += 1
+        self._account.jwt_token = 'token-%d' % self.logins
+
+    renew_tokens = AuthApi.renew_tokens
+
+
+class TestUtil(unittest.TestCase):
+
+    def test_run_parallel(self):
+        def func(item):
+            if item == 3:
+                raise ValueError('Failed chunk')
+            time.sleep(0.01 * (5 - item))  # Finish in reverse order
+            return item * 2
+
+        results = util.run_parallel(func, list(range(5)), workers=3)
+
+        # Results are kept in order, and a failure doesn't affect the others
+        self.assertEqual([result for result, _ in results], [0, 2, 4, None, 8])
+        self.assertIsInstance(results[3][1], ValueError)
+
+    def test_run_parallel_empty(self):
+        self.assertEqual(util.run_parallel(lambda item: item, []), [])
+
+    def test_run_concurrently(self):
+        # Both calls have to wait for each other, so this only passes when they run at the same time
+        barrier = threading.Barrier(2, timeout=5)
+
+        def call(value):
+            barrier.wait()
+            return value
+
+        results, timings = util.run_concurrently(dict(
+            one=lambda: call(1),
+            two=lambda: call(2),
+        ))
+        self.assertEqual(results, dict(one=1, two=2))
+        self.assertEqual(set(timings), {'one', 'two'})
+
+        with self.assertRaises(ValueError):
+            util.run_concurrently(dict(ok=lambda: 1, fail=lambda: int('x')))
+
+    def test_log_body(self):
+        response = requests.Response()
+        response.encoding = 'utf-8'
+        response._content = ('é' * 3000).encode('utf-8')  # pylint: disable=protected-access
+
+        body = '%s' % util._LogBody(response)  # pylint: disable=protected-access
+        self.assertTrue(body.startswith('é' * util.LOG_BODY_LIMIT + '...'))
+        self.assertTrue(body.endswith('(6000 bytes)'))
+
+    @mock.patch.dict(os.environ, {'HTTP_PROXY': 'http://proxy.example.com:3128'})
+    def test_get_proxies(self):
+        try:
+            del util.get_proxies.cached
+        except AttributeError:
+            pass
+
+        try:
+            proxies = util.get_proxies()
+            self.assertEqual(proxies, dict(http='http://proxy.example.com:3128', https='http://proxy.example.com:3128'))
+
+            # The proxies are kept until they expire
+            os.environ['HTTP_PROXY'] = 'http://other.example.com:3128'
+            self.assertIs(util.get_proxies(), proxies)
+
+            util.get_proxies.cached = (time.time() - util.PROXIES_TTL - 1, proxies)
+            self.assertEqual(util.get_proxies(), dict(http='http://other.example.com:3128', https='http://other.example.com:3128'))
+        finally:
+            del util.get_proxies.cached
+
+    def test_parse_iso8601(self):
+        expected = datetime(2020, 7, 30, 9, 15, 0, tzinfo=dateutil.tz.UTC)
+
+        # Fast path
+        self.assertEqual(util.parse_iso8601('2020-07-30T09:15:00Z'), expected)
+        self.assertEqual(util.parse_iso8601_timestamp('2020-07-30T09:15:00Z'), 1596100500)
+
+        # Fallback for other formats
+        self.assertEqual(util.parse_iso8601('2020-07-30T11:15:00+02:00'), expected)
+        self.assertEqual(util.parse_iso8601('2020-07-30T09:15:00.000Z'), expected)
+        self.assertEqual(util.parse_iso8601('2020-07-30 09:15:00'), expected)
+        self.assertEqual(util.parse_iso8601_timestamp('2020-07-30T11:15:00+02:00'), 1596100500)
+
+    def test_token_renewal(self):
+        auth = FakeAuth()
+
+        def request(token_bearer=None):
+            # Only the first token is rejected
+            if token_bearer == 'token-0':
+                raise InvalidTokenException
+            return token_bearer
+
+        def func(_):
+            return util._with_token_renewal(auth, request, token_bearer='token-0')  # pylint: disable=protected-access
+
+        # Requests that fail at the same time only renew the tokens once
+        results = util.run_parallel(func, list(range(4)), workers=4)
+        self.assertEqual(results, [('token-1', None)] * 4)
+        self.assertEqual(auth.logins, 1)
+
+    def test_entitlement_checker(self):
+        checker = util.EntitlementChecker(['1', '2'], now=datetime(2020, 7, 30, 10, 0, 0))
+
+        self.assertFalse(checker.check(None))
+        self.assertTrue(checker.check([{'offers': ['2', '3']}]))
+        self.assertFalse(checker.check([{'offers': ['3']}]))
+
+        # Expired deals are skipped, and we keep the deal that lasts the longest
+        expiry = checker.check([
+            {'offers': ['1'], 'start': '2020-07-30T08:00:00Z', 'end': '2020-07-30T09:00:00Z'},
+            {'offers': ['1'], 'start': '2020-07-30T09:00:00Z', 'end': '2020-08-06T09:15:00Z'},
+            {'offers': ['1'], 'start': '2020-07-30T09:00:00Z', 'end': '2020-08-01T09:15:00Z'},
+        ])
+        self.assertEqual(expiry, datetime(2020, 8, 6, 9, 15, 0, tzinfo=dateutil.tz.UTC))
+
+        # Without offers, nothing is allowed
+        self.assertFalse(util.check_deals_entitlement([{'offers': ['1']}], []))
+
+
+if __name__ == '__main__':
+    unittest.main()